@@ -0,0 +1,105 @@
+#
+# BSD 3-Clause License
+#
+# Copyright (c) 2023, Fred W6BSD
+# All rights reserved.
+#
+"""
+History of the expired spots.
+
+Before Purge drops the expired buckets of the live database, their rows
+are appended to a separate SQLite file. The live database is attached
+and only read, the archive is written from the Purge thread, never from
+the DBInsert thread.
+"""
+
+import logging
+import sqlite3
+from datetime import datetime
+
+from dbutils import bucket_start, connect_db, list_buckets
+
+SQL_ARCHIVE = """
+CREATE TABLE IF NOT EXISTS spots
+(
+  time EPOCH,
+  call TEXT,
+  band INTEGER,
+  frequency INTEGER,
+  snr INTEGER,
+  status INTEGER,
+  extra TEXT,
+  grid TEXT,
+  distance INTEGER,
+  azimuth INTEGER,
+  cqzone INTEGER,
+  ituzone INTEGER,
+  continent TEXT,
+  country TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_time on spots (time);
+CREATE INDEX IF NOT EXISTS idx_band_hour on spots (band, time / 3600000);
+CREATE INDEX IF NOT EXISTS idx_country on spots (country, band, time);
+CREATE TABLE IF NOT EXISTS buckets
+(
+  name TEXT PRIMARY KEY,
+  spots INTEGER,
+  archived EPOCH
+);
+"""
+
+ARCHIVE = """
+INSERT INTO spots SELECT time, call, band, frequency, snr, status, extra, grid,
+  CAST(distance AS INTEGER), CAST(azimuth AS INTEGER), cqzone, ituzone, continent, country
+FROM live.{table} ORDER BY time
+"""
+
+logger = logging.getLogger('ft8ctrl.archive')
+
+
+def create_archive(archive_name):
+  logger.info("Archive: %s", archive_name)
+  conn = connect_db(archive_name)
+  conn.executescript(SQL_ARCHIVE)
+  conn.close()
+
+
+class Archive:
+  """Copy the buckets before they are dropped. The connection is opened
+  by the first call to `archive`, in the calling thread."""
+
+  def __init__(self, db_name, archive_name):
+    self.db_name = db_name
+    self.archive_name = archive_name
+    self.conn = None
+
+  def connect(self):
+    self.conn = connect_db(self.archive_name)
+    self.conn.execute('ATTACH DATABASE ? AS live', (str(self.db_name), ))
+
+  def archive(self, before):
+    """Append the buckets starting before `before`, once. Return the
+    number of rows archived, None if the buckets can't be dropped."""
+    if self.conn is None:
+      self.connect()
+    count = 0
+    curs = self.conn.cursor()
+    curs.execute('SELECT name FROM buckets')
+    done = {name for name, in curs.fetchall()}
+    for table in list_buckets(curs, 'live'):
+      if table in done or bucket_start(table) >= before:
+        continue
+      try:
+        curs.execute('BEGIN')
+        curs.execute(ARCHIVE.format(table=table))
+        rows = curs.rowcount
+        curs.execute('INSERT INTO buckets VALUES (?, ?, ?)', (table, rows, datetime.utcnow()))
+        curs.execute('COMMIT')
+      except sqlite3.OperationalError as err:
+        curs.execute('ROLLBACK')
+        logger.error('Archive %s: %s', table, err)
+        return None
+      count += rows
+    if count:
+      logger.debug('Archive %d spots', count)
+    return count
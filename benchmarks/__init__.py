@@ -0,0 +1,11 @@
+#
+# BSD 3-Clause License
+#
+# Copyright (c) 2023, Fred W6BSD
+# All rights reserved.
+#
+"""
+Benchmarks for the ft8ctrl hot paths.
+Run them from the top of the repository, for example:
+  python -m benchmarks.codec
+"""
@@ -0,0 +1,104 @@
+#
+# BSD 3-Clause License
+#
+# Copyright (c) 2023, Fred W6BSD
+# All rights reserved.
+#
+"""
+Run all the benchmarks and print, or save as JSON, the results.
+  python -m benchmarks --json results.json
+  python -m benchmarks --compare results.json
+"""
+
+import json
+import logging
+import platform
+import subprocess
+import sys
+from argparse import ArgumentParser
+from datetime import datetime
+from importlib import import_module
+
+SUITES = ['codec', 'reply', 'parser', 'geo', 'dxcc', 'lotw', 'dbwriter', 'queries',
+          'selectors']
+LOWER_IS_BETTER = {'us', 'ms'}
+THRESHOLD = 10                  # Percent change flagged as a regression
+
+
+def git_commit():
+  try:
+    return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                          text=True, check=True).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def run_suites(suites, quick=False):
+  results = {}
+  for name in suites:
+    module = import_module(f'benchmarks.{name}')
+    print(f'Running {name}...', file=sys.stderr)
+    results.update(module.run(quick))
+  return {
+    'commit': git_commit(),
+    'date': datetime.utcnow().isoformat(timespec='seconds'),
+    'python': platform.python_version(),
+    'platform': platform.platform(),
+    'results': results,
+  }
+
+
+def compare(base, current):
+  """Return the change, in percent, for each result. Positive is better."""
+  changes = {}
+  for name, result in current['results'].items():
+    if name not in base['results']:
+      continue
+    old = base['results'][name]['value']
+    if not old:
+      continue
+    change = (result['value'] - old) * 100 / old
+    if result['unit'] in LOWER_IS_BETTER:
+      change = -change
+    changes[name] = change
+  return changes
+
+
+def print_results(report, changes=None):
+  changes = changes or {}
+  for name, result in sorted(report['results'].items()):
+    line = f"{name:32s} {result['value']:14,.2f} {result['unit']:10s}"
+    if name in changes:
+      flag = ' <<< regression' if changes[name] < -THRESHOLD else ''
+      line += f" {changes[name]:+7.1f}%{flag}"
+    print(line)
+
+
+def main():
+  parser = ArgumentParser(description="ft8ctrl benchmarks")
+  parser.add_argument("-j", "--json", help="Save the results in this file")
+  parser.add_argument("-c", "--compare", help="Compare with the results saved in this file")
+  parser.add_argument("-q", "--quick", action="store_true", default=False,
+                      help="Fewer iterations, for a quick check")
+  parser.add_argument("-s", "--suite", action="append", choices=SUITES,
+                      help="Run only this suite (can be repeated)")
+  opts = parser.parse_args()
+
+  logging.basicConfig(level=logging.ERROR)
+  report = run_suites(opts.suite or SUITES, opts.quick)
+  changes = None
+  if opts.compare:
+    with open(opts.compare, 'r', encoding='utf-8') as cfd:
+      changes = compare(json.load(cfd), report)
+  print_results(report, changes)
+
+  if opts.json:
+    with open(opts.json, 'w', encoding='utf-8') as jfd:
+      json.dump(report, jfd, indent=2)
+  if changes and any(c < -THRESHOLD for c in changes.values()):
+    return 1
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,55 @@
+#
+# BSD 3-Clause License
+#
+# Copyright (c) 2023, Fred W6BSD
+# All rights reserved.
+#
+"""
+Measure how many packets per second `wsjtx.ft8_decode` can process for
+each packet type WSJT-X sends.
+"""
+
+import timeit
+from argparse import ArgumentParser
+
+import wsjtx
+from benchmarks import packets
+
+SAMPLES = {
+  'WSHeartbeat': packets.heartbeat(),
+  'WSStatus': packets.status(),
+  'WSStatus.short': packets.short_status(),
+  'WSDecode': packets.decode(),
+  'WSClear': packets.clear(),
+  'WSLogged': packets.logged(),
+  'WSClose': packets.close(),
+  'WSADIF': packets.adif(),
+}
+
+
+def bench_decode(number=20000, repeat=5):
+  results = {}
+  for name, pkt in SAMPLES.items():
+    timer = timeit.Timer(lambda p=pkt: wsjtx.ft8_decode(p))
+    best = min(timer.repeat(repeat=repeat, number=number))
+    results[name] = number / best
+  return results
+
+
+def run(quick=False):
+  results = bench_decode(2000 if quick else 20000)
+  return {f'codec.{name}': {'value': rate, 'unit': 'packets/s'}
+          for name, rate in results.items()}
+
+
+def main():
+  parser = ArgumentParser(description="wsjtx codec benchmark")
+  parser.add_argument("-n", "--number", type=int, default=20000,
+                      help="Number of packets decoded per run")
+  opts = parser.parse_args()
+  for name, rate in bench_decode(opts.number).items():
+    print(f"{name:12s} {rate:12,.0f} packets/s")
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,128 @@
+#
+# BSD 3-Clause License
+#
+# Copyright (c) 2023, Fred W6BSD
+# All rights reserved.
+#
+"""
+Synthetic, but realistic, FT8/FT4 traffic for the benchmarks.
+"""
+
+import random
+import string
+from datetime import datetime
+
+from dbutils import DBCommand, DBInsert, connect_db, create_db
+
+PREFIXES = ['W', 'K', 'N', 'AA', 'VE', 'G', 'DL', 'F', 'JA', 'JH', 'VK', 'PY', 'LU',
+            'ZS', 'EA', 'I', 'SP', 'OH', 'UA', 'BY']
+CONTINENTS = ['NA', 'EU', 'AS', 'OC', 'SA', 'AF']
+COUNTRIES = ['United States', 'Canada', 'England', 'Fed. Rep. of Germany', 'France',
+             'Japan', 'Australia', 'Brazil', 'Argentina', 'South Africa', 'Spain', 'Italy']
+EXTRAS = ['DX', 'POTA', 'NA', 'EU', 'JA', 'TEST', 'WW']
+BANDS = {20: 14074000, 40: 7074000, 15: 21074000, 10: 28074000}
+SECTIONS = ['EMA', 'WI', 'SCV', 'ONE', 'STX', 'DX']
+
+
+def callsign(rnd):
+  call = rnd.choice(PREFIXES) + str(rnd.randint(0, 9))
+  call += ''.join(rnd.choices(string.ascii_uppercase, k=rnd.randint(1, 3)))
+  if rnd.random() < .03:
+    call += rnd.choice(['/P', '/R', '/QRP'])
+  return call
+
+
+def grid(rnd):
+  return (rnd.choice(string.ascii_uppercase[:18]) + rnd.choice(string.ascii_uppercase[:18])
+          + str(rnd.randint(0, 9)) + str(rnd.randint(0, 9)))
+
+
+def report(rnd):
+  return f'{rnd.randint(-24, 10):+03d}'
+
+
+def exchange(rnd):
+  """Field Day exchange, class and section"""
+  return f'{rnd.randint(1, 9)}{rnd.choice("ABCDEF")} {rnd.choice(SECTIONS)}'
+
+
+def message(rnd, mycall='W6BSD'):
+  # pylint: disable=too-many-return-statements
+  draw = rnd.random()
+  call1, call2 = callsign(rnd), callsign(rnd)
+  if rnd.random() < .05:
+    call1 = mycall
+  if draw < .30:
+    return f'CQ {call2} {grid(rnd)}'
+  if draw < .35:
+    return f'CQ {rnd.choice(EXTRAS)} {call2} {grid(rnd)}'
+  if draw < .38:
+    return f'CQ {call2}'
+  if draw < .53:
+    return f'{call1} {call2} {grid(rnd)}'
+  if draw < .68:
+    return f'{call1} {call2} {report(rnd)}'
+  if draw < .78:
+    return f'{call1} {call2} R{report(rnd)}'
+  if draw < .88:
+    return f'{call1} {call2} RR73'
+  if draw < .93:
+    return f'{call1} {call2} RRR'
+  if draw < .96:
+    return f'{call1} {call2} 73'
+  if draw < .97:
+    return f'{call1} {call2} {exchange(rnd)}'
+  if draw < .98:
+    return f'{call1} {call2} R {exchange(rnd)}'
+  return 'TNX 73 GL'
+
+
+def messages(count, seed=73):
+  rnd = random.Random(seed)
+  return [message(rnd) for _ in range(count)]
+
+
+def candidate(rnd, band=20, when=None):
+  """A CQ call as DBInsert.write expects it, after the enrichment"""
+  call = callsign(rnd)
+  snr = rnd.randint(-24, 10)
+  when = when or datetime.utcnow()
+  return {
+    'call': call,
+    'extra': rnd.choice(EXTRAS) if rnd.random() < .1 else None,
+    'grid': grid(rnd),
+    'lat': rnd.uniform(-90, 90),
+    'lon': rnd.uniform(-180, 180),
+    'distance': rnd.uniform(100, 19000),
+    'azimuth': rnd.randint(0, 359),
+    'country': rnd.choice(COUNTRIES),
+    'continent': rnd.choice(CONTINENTS),
+    'cqzone': rnd.randint(1, 40),
+    'ituzone': rnd.randint(1, 90),
+    'frequency': BANDS.get(band, 14074000),
+    'band': band,
+    'packet': {'New': True, 'Time': when, 'SNR': snr, 'DeltaTime': round(rnd.uniform(-1, 2), 3),
+               'DeltaFrequency': rnd.randint(200, 3000), 'Mode': '~',
+               'Message': f'CQ {call}', 'LowConfidence': False, 'OffAir': False},
+  }
+
+
+def candidates(count, band=20, seed=73, spread=None):
+  """`count` CQ calls with different callsigns. With `spread` the decode
+  times go back from now over that timedelta, oldest first."""
+  rnd = random.Random(seed)
+  now = datetime.utcnow()
+  records = {}
+  while len(records) < count:
+    when = now - spread * (count - len(records)) / count if spread else None
+    record = candidate(rnd, band, when)
+    records[record['call']] = record
+  return list(records.values())
+
+
+def database(db_name, records):
+  """Create the database `db_name` with `records`, return a connection"""
+  create_db(db_name)
+  conn = connect_db(db_name)
+  DBInsert.apply(conn, [(DBCommand.INSERT, record) for record in records])
+  return conn
@@ -0,0 +1,92 @@
+#
+# BSD 3-Clause License
+#
+# Copyright (c) 2023, Fred W6BSD
+# All rights reserved.
+#
+"""
+Insert enriched CQ calls in a temporary SQLite database, one transaction
+per record with DBInsert.write and in batches with DBInsert.apply, read
+them back the way CandidateStore.load does and expire them.
+"""
+
+import tempfile
+import time
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from benchmarks import corpus
+from dbutils import DBCommand, DBInsert, connect_db, create_db
+
+# Decodes of a busy FT8 cycle
+BATCH_SIZE = 50
+
+
+def bench_write(count=2000, batch_size=1):
+  commands = [(DBCommand.INSERT, record) for record in corpus.candidates(count)]
+  with tempfile.TemporaryDirectory() as tmpdir:
+    db_name = Path(tmpdir).joinpath('bench.sql')
+    create_db(db_name)
+    conn = connect_db(db_name)
+    start = time.perf_counter()
+    for idx in range(0, count, batch_size):
+      DBInsert.apply(conn, commands[idx:idx + batch_size])
+    elapsed = time.perf_counter() - start
+    conn.close()
+  return count / elapsed
+
+
+def bench_read(count=2000, repeat=3):
+  with tempfile.TemporaryDirectory() as tmpdir:
+    conn = corpus.database(Path(tmpdir).joinpath('bench.sql'), corpus.candidates(count))
+    best = float('inf')
+    for _ in range(repeat):
+      start = time.perf_counter()
+      rows = [dict(row) for row in conn.execute('SELECT * FROM cqcalls ORDER BY time')]
+      best = min(best, time.perf_counter() - start)
+    conn.close()
+  return len(rows) / best
+
+
+def bench_purge(count=2000, repeat=3):
+  """Time the expiration of the oldest half of `count` spots, decoded over
+  the last hour"""
+  worst = 0
+  for _ in range(repeat):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      conn = corpus.database(Path(tmpdir).joinpath('bench.sql'),
+                             corpus.candidates(count, spread=timedelta(hours=1)))
+      before = datetime.utcnow() - timedelta(minutes=30)
+      start = time.perf_counter()
+      DBInsert.apply(conn, [(DBCommand.PURGE, before)])
+      worst = max(worst, time.perf_counter() - start)
+      conn.close()
+  return worst * 1000
+
+
+def run(quick=False):
+  count = 200 if quick else 2000
+  return {
+    'dbinsert.write': {'value': bench_write(count), 'unit': 'rows/s'},
+    'dbinsert.batch': {'value': bench_write(count, BATCH_SIZE), 'unit': 'rows/s'},
+    'dbread.load': {'value': bench_read(count), 'unit': 'rows/s'},
+    'dbinsert.purge': {'value': bench_purge(count), 'unit': 'ms'},
+  }
+
+
+def main():
+  parser = ArgumentParser(description="DBInsert benchmark")
+  parser.add_argument("-n", "--number", type=int, default=2000,
+                      help="Number of records inserted")
+  parser.add_argument("-b", "--batch", type=int, default=BATCH_SIZE,
+                      help="Number of records per transaction")
+  opts = parser.parse_args()
+  print(f"DBInsert.write {bench_write(opts.number):12,.0f} rows/s")
+  print(f"DBInsert.apply {bench_write(opts.number, opts.batch):12,.0f} rows/s")
+  print(f"SELECT *       {bench_read(opts.number):12,.0f} rows/s")
+  print(f"Purge          {bench_purge(opts.number):12,.2f} ms")
+
+
+if __name__ == '__main__':
+  main()
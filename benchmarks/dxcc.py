@@ -0,0 +1,76 @@
+#
+# BSD 3-Clause License
+#
+# Copyright (c) 2023, Fred W6BSD
+# All rights reserved.
+#
+"""
+Callsign to DXCC entity with the installed cty file. Time the build
+and the load of the resolver trie, then the lookups from the DXEntity
+dbm file, from the trie and through the LRU cache.
+"""
+
+import random
+import tempfile
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+import DXEntity
+
+import dxcc
+from benchmarks import corpus
+
+
+def lookups(func, calls):
+  for call in calls:
+    try:
+      func(call)
+    except KeyError:
+      pass
+
+
+def bench_dxcc(count=20000, repeat=3):
+  rnd = random.Random(73)
+  calls = [corpus.callsign(rnd) for _ in range(count)]
+  results = {}
+  with tempfile.TemporaryDirectory() as tmpdir:
+    cache = Path(tmpdir).joinpath('cty.trie')
+    start = time.perf_counter()
+    dxcc.Resolver.save(cache, dxcc.Resolver.build(DXEntity.CTY_DB))
+    results['build'] = (time.perf_counter() - start) * 1000
+    dxcc.Resolver._instance = None  # pylint: disable=protected-access
+    start = time.perf_counter()
+    resolver = dxcc.Resolver(DXEntity.CTY_DB, cache)
+    results['load'] = (time.perf_counter() - start) * 1000
+  # pylint: disable=protected-access
+  funcs = (('dxentity', DXEntity.DXCC()._get_prefix), ('trie', resolver._resolve),
+           ('lru', resolver.lookup))
+  for name, func in funcs:
+    best = float('inf')
+    for _ in range(repeat):
+      start = time.perf_counter()
+      lookups(func, calls[:count // 10] if name == 'dxentity' else calls)
+      best = min(best, time.perf_counter() - start)
+    results[name] = (count // 10 if name == 'dxentity' else count) / best
+  return results
+
+
+def run(quick=False):
+  results = bench_dxcc(2000 if quick else 20000)
+  return {f'dxcc.{name}': {'value': value, 'unit': 'ms' if name in ('build', 'load') else 'calls/s'}
+          for name, value in results.items()}
+
+
+def main():
+  parser = ArgumentParser(description="Callsign to DXCC entity lookups")
+  parser.add_argument("-n", "--number", type=int, default=20000,
+                      help="Number of callsigns")
+  opts = parser.parse_args()
+  for name, value in bench_dxcc(opts.number).items():
+    unit = 'ms' if name in ('build', 'load') else 'calls/s'
+    print(f"{name:<9} {value:12,.1f} {unit}")
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,71 @@
+#
+# BSD 3-Clause License
+#
+# Copyright (c) 2023, Fred W6BSD
+# All rights reserved.
+#
+"""
+Distance and azimuth of the CQ calls grids, computed for each call,
+read from the GeoTable of the station grid, or computed for all the
+grids at once with the batch functions (numpy when installed).
+"""
+
+import random
+import time
+from argparse import ArgumentParser
+
+import geo
+from benchmarks import corpus
+
+MY_GRID = 'CM87'
+
+
+def exact(grids, origin=geo.grid2latlon(MY_GRID)):
+  for grid in grids:
+    lat, lon = geo.grid2latlon(grid)
+    geo.distance(origin, (lat, lon))
+    geo.azimuth(origin, (lat, lon))
+
+
+def table(grids, geo_table=geo.GeoTable(MY_GRID, cache=None)):
+  for grid in grids:
+    geo_table.lookup(grid)
+
+
+def batch(grids, origin=geo.grid2latlon(MY_GRID)):
+  lats, lons = geo.grids2latlon(grids)
+  geo.distances(origin, lats, lons)
+  geo.azimuths(origin, lats, lons)
+
+
+def bench_geo(count=20000, repeat=3):
+  rnd = random.Random(73)
+  grids = [corpus.grid(rnd) for _ in range(count)]
+  results = {}
+  for name, func in (('exact', exact), ('table', table), ('batch', batch)):
+    best = float('inf')
+    for _ in range(repeat):
+      geo.grid2latlon.cache_clear()
+      start = time.perf_counter()
+      func(grids)
+      best = min(best, time.perf_counter() - start)
+    results[name] = count / best
+  return results
+
+
+def run(quick=False):
+  results = bench_geo(2000 if quick else 20000)
+  return {f'geo.{name}': {'value': rate, 'unit': 'grids/s'} for name, rate in results.items()}
+
+
+def main():
+  parser = ArgumentParser(description="Grid distance and azimuth")
+  parser.add_argument("-n", "--number", type=int, default=20000,
+                      help="Number of grids")
+  opts = parser.parse_args()
+  for name, rate in bench_geo(opts.number).items():
+    print(f"{name:<6} {rate:12,.0f} grids/s")
+
+
+if __name__ == '__main__':
+  main()
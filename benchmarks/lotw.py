@@ -0,0 +1,65 @@
+#
+# BSD 3-Clause License
+#
+# Copyright (c) 2023, Fred W6BSD
+# All rights reserved.
+#
+"""
+LOTW users lookups. Build a temporary index of synthetic users, then
+time the lookups of callsigns in the index and of callsigns that are
+not, answered by the Bloom filter.
+"""
+
+import random
+import tempfile
+import time
+from argparse import ArgumentParser
+from datetime import date
+from pathlib import Path
+
+import lotw
+from benchmarks import corpus
+
+
+def bench_lotw(users=100000, count=20000):
+  rnd = random.Random(73)
+  today = date.today().toordinal()
+  index = {}
+  while len(index) < users:
+    index[corpus.callsign(rnd)] = today - rnd.randint(0, 1000)
+  known = rnd.sample(list(index), count)
+  unknown = [call + 'X' for call in known]
+  results = {}
+  with tempfile.TemporaryDirectory() as tmpdir:
+    path = Path(tmpdir).joinpath('lotw.idx')
+    start = time.perf_counter()
+    lotw.LOTWIndex.write(path, index)
+    results['build'] = (time.perf_counter() - start) * 1000
+    lotw_index = lotw.LOTWIndex(path)
+    for name, calls in (('hit', known), ('miss', unknown)):
+      start = time.perf_counter()
+      for call in calls:
+        lotw_index.lastseen(call)
+      results[name] = count / (time.perf_counter() - start)
+    lotw_index.close()
+  return results
+
+
+def run(quick=False):
+  results = bench_lotw(20000 if quick else 100000, 2000 if quick else 20000)
+  return {f'lotw.{name}': {'value': value, 'unit': 'ms' if name == 'build' else 'calls/s'}
+          for name, value in results.items()}
+
+
+def main():
+  parser = ArgumentParser(description="LOTW users lookups")
+  parser.add_argument("-u", "--users", type=int, default=100000,
+                      help="Number of LOTW users")
+  opts = parser.parse_args()
+  for name, value in bench_lotw(opts.users).items():
+    unit = 'ms' if name == 'build' else 'calls/s'
+    print(f"{name:<6} {value:12,.1f} {unit}")
+
+
+if __name__ == '__main__':
+  main()
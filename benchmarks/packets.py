@@ -0,0 +1,106 @@
+#
+# BSD 3-Clause License
+#
+# Copyright (c) 2023, Fred W6BSD
+# All rights reserved.
+#
+"""
+Build raw WSJT-X datagrams, the way WSJT-X would send them, to feed
+the benchmarks.
+"""
+
+import struct
+
+WS_MAGIC = 0xADBCCBDA
+WS_SCHEMA = 2
+CLIENT_ID = 'WSJT-X'
+
+
+def _string(value):
+  if value is None:
+    return struct.pack('!i', -1)
+  value = value.encode('utf-8')
+  return struct.pack('!i', len(value)) + value
+
+
+def _header(pkt_type, client_id=CLIENT_ID):
+  return struct.pack('!III', WS_MAGIC, WS_SCHEMA, pkt_type) + _string(client_id)
+
+
+def _datetime(jday, msec):
+  return struct.pack('!QIB', jday, msec, 1)
+
+
+def heartbeat(max_schema=3, version='2.6.1', revision='abcdef'):
+  return _header(0) + struct.pack('!I', max_schema) + _string(version) + _string(revision)
+
+
+def status(frequency=14074000, dx_call='W6BSD', tx_message='W6BSD K1ABC FN42',
+           transmitting=False, decoding=False, mode='FT8'):
+  # pylint: disable=too-many-arguments,too-many-positional-arguments
+  return b''.join([
+    _header(1),
+    struct.pack('!Q', frequency),
+    _string(mode), _string(dx_call), _string('-10'), _string(mode),
+    struct.pack('!???II', True, transmitting, decoding, 1500, 1500),
+    _string('K1ABC'), _string('FN42'), _string(''),
+    struct.pack('!?', False),
+    _string(''),
+    struct.pack('!?BII', False, 0, 20, 15),
+    _string('Default'),
+    _string(tx_message),
+  ])
+
+
+# WSJT-X before 2.3 stops the Status packet after the SOMode field
+def short_status(frequency=14074000, dx_call='W6BSD', mode='FT8'):
+  return b''.join([
+    _header(1),
+    struct.pack('!Q', frequency),
+    _string(mode), _string(dx_call), _string('-10'), _string(mode),
+    struct.pack('!???II', True, False, False, 1500, 1500),
+    _string('K1ABC'), _string('FN42'), _string(''),
+    struct.pack('!?', False),
+    _string(''),
+    struct.pack('!?B', False, 2),
+  ])
+
+
+def decode(message='CQ W6BSD CM87', snr=-12, delta_time=0.2, delta_freq=1234,
+           time_ms=43215000, mode='~'):
+  # pylint: disable=too-many-arguments,too-many-positional-arguments
+  return b''.join([
+    _header(2),
+    struct.pack('!?Iid I', True, time_ms, snr, delta_time, delta_freq),
+    _string(mode), _string(message),
+    struct.pack('!??', False, False),
+  ])
+
+
+def clear(window=1):
+  return _header(3) + struct.pack('!B', window)
+
+
+def close():
+  return _header(6)
+
+
+def adif(call='W6BSD', grid='CM87'):
+  record = (f'<call:{len(call)}>{call} <gridsquare:{len(grid)}>{grid} <mode:3>FT8 '
+            '<rst_sent:3>-12 <rst_rcvd:3>-08 <qso_date:8>20240101 <time_on:6>120000 '
+            '<band:3>20m <freq:9>14.074000 <station_callsign:5>K1ABC <eor>')
+  return _header(12) + _string('\n<adif_ver:5>3.1.0\n<programid:6>WSJT-X\n<EOH>\n' + record)
+
+
+def logged(dx_call='W6BSD', dx_grid='CM87', frequency=14074000):
+  return b''.join([
+    _header(5),
+    _datetime(2460000, 43215000),
+    _string(dx_call), _string(dx_grid),
+    struct.pack('!Q', frequency),
+    _string('FT8'), _string('-12'), _string('-08'), _string('100'),
+    _string('Thanks for the QSO'), _string(''),
+    _datetime(2460000, 43200000),
+    _string(''), _string('K1ABC'), _string('FN42'),
+    _string(''), _string(''), _string(''),
+  ])
@@ -0,0 +1,70 @@
+#
+# BSD 3-Clause License
+#
+# Copyright (c) 2023, Fred W6BSD
+# All rights reserved.
+#
+"""
+Parse a corpus of FT8/FT4 messages with the messages tokenizer and
+with the regular expressions ft8ctrl used before it.
+"""
+
+import re
+import time
+from argparse import ArgumentParser
+
+import messages
+from benchmarks import corpus
+
+LEGACY_PARSERS = {
+  'REPLY': re.compile(r'^((?!CQ)(?P<to>\w+)(|/\w+)) (?P<call>\w+)(|/\w+) .*'),
+  'CQ': re.compile(r'''^CQ\s(?:CQ\s|(?P<extra>[\S.]+)\s|)
+                   (?P<call>\w+(|/\w+))\s
+                   (?P<grid>[A-Z]{2}[0-9]{2})''', re.VERBOSE),
+  'BROKENCQ': re.compile(r'^CQ\s(?P<call>\w+(|/\w+))$'),
+}
+
+
+def legacy_parser(message):
+  for name, regexp in LEGACY_PARSERS.items():
+    if not (match := regexp.match(message)):
+      continue
+    data = match.groupdict()
+    if name == 'BROKENCQ':
+      name = 'CQ'
+      data['extra'] = data['grid'] = None
+    return (name, data)
+  return (None, None)
+
+
+def bench_parser(count=50000, repeat=3):
+  corpus_messages = corpus.messages(count)
+  results = {}
+  for name, parser in (('regex', legacy_parser), ('tokenizer', messages.parse)):
+    best = float('inf')
+    for _ in range(repeat):
+      start = time.perf_counter()
+      for message in corpus_messages:
+        parser(message)
+      best = min(best, time.perf_counter() - start)
+    results[name] = count / best
+  return results
+
+
+def run(quick=False):
+  results = bench_parser(5000 if quick else 50000)
+  return {f'parser.{name}': {'value': rate, 'unit': 'messages/s'}
+          for name, rate in results.items()}
+
+
+def main():
+  parser = ArgumentParser(description="FT8 message parser benchmark")
+  parser.add_argument("-n", "--number", type=int, default=50000,
+                      help="Number of messages in the corpus")
+  opts = parser.parse_args()
+  for name, rate in bench_parser(opts.number).items():
+    print(f"{name:<10} {rate:12,.0f} messages/s")
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,104 @@
+#
+# BSD 3-Clause License
+#
+# Copyright (c) 2023, Fred W6BSD
+# All rights reserved.
+#
+"""
+Check that the dbutils.HOT_QUERIES read every table of the cqcalls view
+through their index in dbutils.HOT_INDEXES, with EXPLAIN QUERY PLAN,
+then time them on a temporary database with candidates on all the bands,
+decoded over the last 30 minutes. The suite fails if a query scans a
+table or uses another index.
+"""
+
+import re
+import tempfile
+import time
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from benchmarks import corpus
+from dbutils import HOT_INDEXES, HOT_QUERIES, list_buckets, query_plan
+
+BANDS = (10, 12, 15, 17, 20, 30, 40, 80)
+SPREAD = timedelta(minutes=30)
+PARAMS = {
+  'candidates': lambda now: (20, now - timedelta(minutes=5)),
+  'status': lambda now: (20, 1),
+  'call': lambda now: ('W6BSD', 20),
+  'recent': lambda now: (now - timedelta(minutes=1), ),
+}
+
+
+PLAN_STEP = re.compile(r'(?:SCAN|SEARCH) (\S+)(?: USING (?:COVERING )?INDEX (\S+))?')
+
+
+def check_plans(conn):
+  """Raise RuntimeError if a query doesn't read every table of the cqcalls
+  view with its index"""
+  tables = ['worked'] + list_buckets(conn.cursor())
+  plans = {}
+  for name, query in HOT_QUERIES.items():
+    plans[name] = query_plan(conn, query)
+    indexes = {}
+    for detail in plans[name]:
+      if match := PLAN_STEP.match(detail):
+        indexes[match.group(1)] = match.group(2)
+    for table in tables:
+      expected = f'idx_{table}_{HOT_INDEXES[name]}'
+      if table not in indexes:
+        raise RuntimeError(f'Query "{name}" doesn\'t read {table}: {plans[name]}')
+      if indexes[table] != expected:
+        raise RuntimeError(f'Query "{name}" reads {table} with {indexes[table]}, '
+                           f'expected {expected}')
+  return plans
+
+
+def bench_queries(count=1000, repeat=20):
+  records = [record for band in BANDS
+             for record in corpus.candidates(count, band, seed=band, spread=SPREAD)]
+  results = {}
+  with tempfile.TemporaryDirectory() as tmpdir:
+    conn = corpus.database(Path(tmpdir).joinpath('bench.sql'), records)
+    check_plans(conn)
+    now = datetime.utcnow()
+    for name, query in HOT_QUERIES.items():
+      params = PARAMS[name](now)
+      best = float('inf')
+      for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute('BEGIN')
+        conn.execute(query, params).fetchall()
+        conn.execute('ROLLBACK')
+        best = min(best, time.perf_counter() - start)
+      results[name] = best * 1000
+    conn.close()
+  return results
+
+
+def run(quick=False):
+  results = bench_queries(100 if quick else 1000)
+  return {f'query.{name}': {'value': value, 'unit': 'ms'} for name, value in results.items()}
+
+
+def main():
+  parser = ArgumentParser(description="Query plans of the database hot queries")
+  parser.add_argument("-n", "--number", type=int, default=1000,
+                      help="Number of candidates per band")
+  opts = parser.parse_args()
+  with tempfile.TemporaryDirectory() as tmpdir:
+    conn = corpus.database(Path(tmpdir).joinpath('plan.sql'),
+                           corpus.candidates(100, spread=SPREAD))
+    for name, plan in check_plans(conn).items():
+      for detail in plan:
+        if detail.startswith(('SCAN', 'SEARCH')):
+          print(f"{name:<12} {detail}")
+    conn.close()
+  for name, value in bench_queries(opts.number).items():
+    print(f"{name:<12} {value:10.3f} ms")
+
+
+if __name__ == '__main__':
+  main()
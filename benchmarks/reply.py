@@ -0,0 +1,90 @@
+#
+# BSD 3-Clause License
+#
+# Copyright (c) 2023, Fred W6BSD
+# All rights reserved.
+#
+"""
+Time between the transmit slot boundary and the moment the Reply
+packet leaves the socket, building the packet with WSReply or with
+the pre-encoded ReplyEncoder templates.
+"""
+
+import socket
+import statistics
+import time
+from argparse import ArgumentParser
+from datetime import datetime
+
+import wsjtx
+
+CANDIDATE = {
+  'time': datetime.utcnow(),
+  'snr': -12,
+  'packet': {'DeltaTime': 0.2, 'DeltaFrequency': 1234, 'Mode': '~',
+             'Message': 'CQ W6BSD CM87'},
+}
+
+
+def with_wsreply(data):
+  pkt = data['packet']
+  packet = wsjtx.WSReply()
+  packet.Time = data['time']
+  packet.SNR = data['snr']
+  packet.DeltaTime = pkt['DeltaTime']
+  packet.DeltaFrequency = pkt['DeltaFrequency']
+  packet.Mode = pkt['Mode']
+  packet.Message = pkt['Message']
+  packet.Modifiers = wsjtx.Modifiers.SHIFT
+  return packet.raw()
+
+
+def with_encoder(data, encoder=wsjtx.ReplyEncoder()):
+  pkt = data['packet']
+  return encoder.reply(data['time'], data['snr'], pkt['DeltaTime'], pkt['DeltaFrequency'],
+                       pkt['Mode'], pkt['Message'], modifiers=wsjtx.Modifiers.SHIFT)
+
+
+def bench_reply(number=20000):
+  """Return the latency in microseconds (mean, p99) for each encoder"""
+  results = {}
+  sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+  sink.bind(('127.0.0.1', 0))
+  sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+  addr = sink.getsockname()
+  try:
+    for name, encode in (('WSReply', with_wsreply), ('ReplyEncoder', with_encoder)):
+      samples = []
+      for _ in range(number):
+        slot = time.perf_counter()
+        sock.sendto(encode(CANDIDATE), addr)
+        samples.append((time.perf_counter() - slot) * 10**6)
+        sink.recv(2048)
+      samples.sort()
+      results[name] = {'mean': statistics.fmean(samples),
+                       'p99': samples[int(len(samples) * .99)]}
+  finally:
+    sock.close()
+    sink.close()
+  return results
+
+
+def run(quick=False):
+  results = {}
+  for name, result in bench_reply(2000 if quick else 20000).items():
+    results[f'reply.{name}.mean'] = {'value': result['mean'], 'unit': 'us'}
+    results[f'reply.{name}.p99'] = {'value': result['p99'], 'unit': 'us'}
+  return results
+
+
+def main():
+  parser = ArgumentParser(description="Reply packet latency after the slot boundary")
+  parser.add_argument("-n", "--number", type=int, default=20000,
+                      help="Number of reply packets sent")
+  opts = parser.parse_args()
+  for name, result in bench_reply(opts.number).items():
+    print(f"{name:12s} mean: {result['mean']:6.1f} µs  p99: {result['p99']:6.1f} µs")
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,132 @@
+#
+# BSD 3-Clause License
+#
+# Copyright (c) 2023, Fred W6BSD
+# All rights reserved.
+#
+"""
+Time the call selection, the Snapshot plus CallSelector._get and
+select_record, of every shipped plugin with 10, 100 and 1000 candidates
+on the band. The candidates are read from the CandidateStore. The
+"chain" result runs all the plugins on one Snapshot, as LoadPlugins does
+when none of them selects a call. The "rank" results time the choice of
+the best candidate with each ranking.
+"""
+
+import logging
+import tempfile
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+import yaml
+
+import plugins
+from benchmarks import corpus
+from candidates import CandidateStore
+from config import Config
+from plugins.base import Snapshot
+from plugins.ranking import RANKINGS, Ranking
+
+BAND = 20
+SIZES = (10, 100, 1000)
+PLUGINS = ('Any', 'CallSign', 'Continent', 'Country', 'CQZone', 'DXCC100', 'Extra', 'Grid',
+           'ITUZone')
+
+CONFIG = {
+  'ft8ctrl': {'my_call': 'W6BSD', 'my_grid': 'CM87', 'retry_time': 15},
+  'BlackList': ['KC5TT', 'W5JDC'],
+  'Any': {'min_snr': -18, 'max_snr': 3},
+  'CallSign': {'regexp': r'^[WKN](\w|)\d\w+', 'list': ['VK2ABC']},
+  'Grid': {'regexp': '^[EF][NM].*'},
+  'Continent': {'list': ['EU', 'OC', 'AS']},
+  'Country': {'reverse': True, 'list': ['United States', 'Canada']},
+  'CQZone': {'list': [14, 5, 3]},
+  'ITUZone': {'reverse': True, 'list': [8, 6]},
+  'DXCC100': {'worked_count': 2},
+  'Extra': {'list': ['POTA', 'NA']},
+}
+
+log = logging.getLogger('ft8ctrl.benchmarks')
+
+
+def setup_config(tmpdir):
+  db_name = Path(tmpdir).joinpath('bench.sql')
+  config = dict(CONFIG)
+  config['ft8ctrl'] = dict(CONFIG['ft8ctrl'], db_name=str(db_name))
+  config_file = Path(tmpdir).joinpath('ft8ctrl.yaml')
+  with open(config_file, 'w', encoding='utf-8') as cfd:
+    yaml.dump(config, cfd)
+  Config(config_file)
+  return Path(Config()['ft8ctrl.db_name'])
+
+
+def load_selectors(names=PLUGINS):
+  selectors = {}
+  for name in names:
+    try:
+      selectors[name] = getattr(plugins, name)()
+    except (OSError, KeyError, AttributeError) as err:
+      log.warning('Skipping %s: %s', name, err)
+  return selectors
+
+
+def fill(size):
+  """Fresh candidates, decoded now"""
+  store = CandidateStore()
+  store.clear()
+  for record in corpus.candidates(size, BAND):
+    store.insert(record)
+  for record in corpus.candidates(size // 2, 40, seed=size):
+    store.insert(record)
+
+
+def bench_selectors(sizes=SIZES, number=50):
+  """Return the mean time of selector.get() in milliseconds"""
+  results = {}
+  with tempfile.TemporaryDirectory() as tmpdir:
+    setup_config(tmpdir)
+    selectors = load_selectors()
+    delta = max(selector.delta for selector in selectors.values())
+    for size in sizes:
+      fill(size)
+      for name, selector in selectors.items():
+        start = time.perf_counter()
+        for _ in range(number):
+          selector.get(Snapshot(BAND, delta=selector.delta))
+        results[(name, size)] = (time.perf_counter() - start) * 1000 / number
+      start = time.perf_counter()
+      for _ in range(number):
+        snapshot = Snapshot(BAND, delta=delta)
+        for selector in selectors.values():
+          selector.get(snapshot)
+      results[('chain', size)] = (time.perf_counter() - start) * 1000 / number
+      snapshot = Snapshot(BAND, delta=delta)
+      for rank in [*RANKINGS, {'snr': 1, 'rarity': 2}]:
+        ranking = Ranking(rank)
+        start = time.perf_counter()
+        for _ in range(number):
+          next(ranking.best(snapshot.records, snapshot), None)
+        name = 'rank.' + ('mix' if isinstance(rank, dict) else rank)
+        results[(name, size)] = (time.perf_counter() - start) * 1000 / number
+  return results
+
+
+def run(quick=False):
+  results = bench_selectors(number=5 if quick else 50)
+  return {f'selector.{name}.{size}': {'value': value, 'unit': 'ms'}
+          for (name, size), value in results.items()}
+
+
+def main():
+  parser = ArgumentParser(description="Call selectors benchmark")
+  parser.add_argument("-n", "--number", type=int, default=50,
+                      help="Number of selections per plugin and size")
+  opts = parser.parse_args()
+  logging.basicConfig(level=logging.ERROR)
+  for (name, size), value in bench_selectors(number=opts.number).items():
+    print(f"{name:10s} {size:5d} candidates {value:8.3f} ms")
+
+
+if __name__ == '__main__':
+  main()
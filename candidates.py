@@ -0,0 +1,172 @@
+#
+# BSD 3-Clause License
+#
+# Copyright (c) 2023, Fred W6BSD
+# All rights reserved.
+#
+"""
+In-memory copy of the cqcalls table.
+
+The Sequencer adds the CQ calls as they are decoded and the selectors
+read them from here. SQLite is only written behind, by the DBInsert
+thread, for the history and the worked status.
+"""
+
+import logging
+from collections import Counter, defaultdict
+from datetime import timedelta
+from threading import Lock
+
+import geo
+from dbutils import COLUMNS, read_db
+from dxcc import Resolver
+
+# Decodes are added in time order, give some room to the late ones
+# before stopping the scan of a band.
+ORDER_SLACK = timedelta(seconds=60)
+
+logger = logging.getLogger('ft8ctrl.candidates')
+
+
+class CallInfo:
+  # pylint: disable=too-few-public-methods
+  """Add the location and the DXCC entity to a CQ call"""
+
+  def __init__(self, grid):
+    self.geo = geo.GeoTable(grid)
+    self.dxe_lookup = Resolver().lookup
+
+  def __call__(self, data):
+    """Complete `data` in place, return False for unknown callsigns"""
+    data['lat'], data['lon'], data['distance'], data['azimuth'] = self.geo.lookup(data['grid'])
+    try:
+      dxentity = self.dxe_lookup(data['call'])
+    except KeyError:
+      logger.error('DXEntity for %s not found, this is probably a fake callsign', data['call'])
+      return False
+    data['country'] = dxentity.country
+    data['continent'] = dxentity.continent
+    data['cqzone'] = dxentity.cqzone
+    data['ituzone'] = dxentity.ituzone
+    return True
+
+
+class CandidateStore:
+  """The records are indexed by band then callsign, in the order they have
+  been decoded. The methods follow the SQL statements of DBInsert and
+  Purge, so the database and the store stay the same. The methods
+  changing a record return a copy of it, for DBInsert. `version` changes
+  with the content of the store."""
+  # Singleton class
+
+  def __new__(cls):
+    if hasattr(cls, '_instance') and isinstance(cls._instance, cls):
+      return cls._instance
+
+    cls._instance = super(CandidateStore, cls).__new__(cls)
+    cls._instance._lock = Lock()
+    cls._instance._bands = defaultdict(dict)
+    cls._instance._worked = defaultdict(Counter)
+    cls._instance.version = 0
+    return cls._instance
+
+  def __len__(self):
+    return sum(len(band) for band in self._bands.values())
+
+  def clear(self):
+    with self._lock:
+      self._bands.clear()
+      self._worked.clear()
+      self.version += 1
+
+  def load(self, db_name):
+    """Replace the content of the store with the database"""
+    curs = read_db(db_name).cursor()
+    curs.execute('SELECT * FROM cqcalls ORDER BY time')
+    bands = defaultdict(dict)
+    worked = defaultdict(Counter)
+    count = 0
+    for row in curs:
+      row = dict(row)
+      bands[row['band']][row['call']] = row
+      if row['status'] == 2:
+        worked[row['band']][row['country']] += 1
+      count += 1
+    with self._lock:
+      self._bands = bands
+      self._worked = worked
+      self.version += 1
+    logger.info('Candidate store: %d records loaded', count)
+
+  def insert(self, data):
+    """INSERT ... ON CONFLICT(call, band) DO UPDATE SET snr, packet unless worked"""
+    packet = data['packet']
+    with self._lock:
+      band = self._bands[data['band']]
+      record = band.get(data['call'])
+      if record is None:
+        record = {key: data.get(key) for key in COLUMNS}
+        record['time'] = packet['Time']
+        record['status'] = 0
+        record['snr'] = packet['SNR']
+        band[data['call']] = record
+        self.version += 1
+        return dict(record)
+      if record['status'] != 2:
+        record['snr'] = packet['SNR']
+        record['packet'] = packet
+        self.version += 1
+        return dict(record)
+    return None
+
+  def status(self, call, band, status):
+    """Change the status of a record not yet worked"""
+    with self._lock:
+      record = self._bands[band].get(call)
+      if record is None or record['status'] == 2:
+        return None
+      record['status'] = status
+      if status == 2:
+        self._worked[band][record['country']] += 1
+      self.version += 1
+      return dict(record)
+
+  def delete(self, call, band):
+    """Delete a record being called (status 1)"""
+    with self._lock:
+      records = self._bands[band]
+      if call in records and records[call]['status'] == 1:
+        self.version += 1
+        return records.pop(call)
+    return None
+
+  def purge(self, before):
+    """Delete the records not worked older than `before`"""
+    count = 0
+    with self._lock:
+      for records in self._bands.values():
+        expired = [call for call, rec in records.items()
+                   if rec['status'] < 2 and rec['time'] < before]
+        for call in expired:
+          del records[call]
+        count += len(expired)
+      if count:
+        self.version += 1
+    return count
+
+  def select(self, band, start):
+    """Copy of the records not yet called, decoded on `band` after `start`"""
+    records = []
+    limit = start - ORDER_SLACK
+    with self._lock:
+      for record in reversed(self._bands[band].values()):
+        if record['time'] <= limit:
+          break
+        if record['status'] == 0 and record['time'] > start:
+          records.append(dict(record))
+    return records
+
+  def worked_countries(self, band):
+    """Number of contacts logged per country on `band`"""
+    with self._lock:
+      return Counter(self._worked[band])
@@ -0,0 +1,82 @@
+#
+# BSD 3-Clause License
+#
+# Copyright (c) 2023, Fred W6BSD
+# All rights reserved.
+#
+"""
+Capture file for the WSJT-X UDP stream.
+
+The file starts with CAPTURE_MAGIC, followed by one entry per datagram:
+  arrival time    double, seconds since the epoch
+  length          uint32
+  datagram        length bytes
+All the values are big-endian like the WSJT-X protocol.
+"""
+
+import struct
+import time
+
+import wsjtx
+
+CAPTURE_MAGIC = b'FT8CAP\x00\x01'
+CAPTURE_BUFFER = 1 << 16
+ENTRY = struct.Struct('!dI')
+
+
+class CaptureWriter:
+  """Append the received datagrams to a capture file"""
+
+  def __init__(self, filename, buffering=CAPTURE_BUFFER):
+    self.filename = filename
+    self.count = 0
+    self._fd = open(filename, 'ab', buffering=buffering)  # pylint: disable=consider-using-with
+    if self._fd.tell() == 0:
+      self._fd.write(CAPTURE_MAGIC)
+
+  def write(self, data, arrival=None):
+    arrival = time.time() if arrival is None else arrival
+    self._fd.write(ENTRY.pack(arrival, len(data)))
+    self._fd.write(data)
+    self.count += 1
+
+  def close(self):
+    if not self._fd.closed:
+      self._fd.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *_):
+    self.close()
+
+  def __repr__(self):
+    return f"<CaptureWriter> {self.filename} ({self.count} packets)"
+
+
+def read_capture(filename):
+  """Generator returning (arrival, datagram) for each entry of the capture file"""
+  with open(filename, 'rb') as cfd:
+    if cfd.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+      raise IOError(f'{filename} is not a capture file')
+    while header := cfd.read(ENTRY.size):
+      if len(header) < ENTRY.size:
+        raise IOError(f'{filename} truncated entry')
+      arrival, length = ENTRY.unpack(header)
+      data = cfd.read(length)
+      if len(data) < length:
+        raise IOError(f'{filename} truncated entry')
+      yield arrival, data
+
+
+def retime(data, shift):
+  """Move the time of a Decode packet by `shift` milliseconds"""
+  _, _, pkt_type = wsjtx.SHEAD.unpack_from(data)
+  if pkt_type != wsjtx.PacketType.DECODE.value:
+    return data
+  id_len, = wsjtx.SINT32.unpack_from(data, wsjtx.SHEAD.size)
+  offset = wsjtx.SHEAD.size + wsjtx.SINT32.size + max(id_len, 0) + wsjtx.SBOOL.size
+  qtm, = wsjtx.SUINT32.unpack_from(data, offset)
+  data = bytearray(data)
+  wsjtx.SUINT32.pack_into(data, offset, int(qtm + shift) % 86400000)
+  return bytes(data)
@@ -5,11 +5,11 @@ import sys
 import textwrap
 from argparse import ArgumentParser
 
-import DXEntity
+from dxcc import Resolver
 
 
 def clist():
-  dxcc = DXEntity.DXCC()
+  dxcc = Resolver()
   countries = dxcc.entities
   for _country in sorted(countries):
     print(_country)
@@ -17,7 +17,7 @@ def clist():
 
 def get_prefix(prefix):
   # pylint: disable=no-member
-  dxcc = DXEntity.DXCC()
+  dxcc = Resolver()
   prefix = prefix.upper()
   result = dxcc.lookup(prefix)
   print(f"Prefix: {prefix} > {result.prefix} = {result.country} - Continent: "
@@ -26,7 +26,7 @@ def get_prefix(prefix):
 
 
 def check(ctry):
-  dxcc = DXEntity.DXCC()
+  dxcc = Resolver()
   ctry = ctry.upper()
   countries = {k.upper(): k for k in dxcc.entities}
   if ctry not in countries:
@@ -35,7 +35,7 @@ def check(ctry):
 
 
 def country(ctry):
-  dxcc = DXEntity.DXCC()
+  dxcc = Resolver()
   wrapper = textwrap.TextWrapper()
   wrapper.subsequent_indent = wrapper.initial_indent = " >  "
 
@@ -8,14 +8,46 @@
 import json
 import logging
 import sqlite3
+import struct
 import time
-from datetime import datetime
+from collections.abc import Mapping
+from datetime import datetime, timedelta
 from enum import Enum
-from threading import Thread
+from itertools import groupby
+from operator import itemgetter
+from queue import Empty
+from threading import Thread, local
 
-import DXEntity
+import metrics
 
-import geo
+# Seconds DBInsert waits for more commands before writing a batch
+BATCH_WINDOW = 0.5
+# Attempts to write a batch in one transaction, before writing its
+# commands one by one
+BATCH_ATTEMPTS = 2
+
+# In WAL mode the readers don't block the writer and the writer doesn't
+# block the readers. The journal mode is stored in the database file.
+JOURNAL_MODE = 'WAL'
+JOURNAL_MODES = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+
+# Pragmas set on every connection. synchronous=NORMAL only syncs WAL
+# files at checkpoints, a power loss can lose the last transactions but
+# can't corrupt the database.
+PRAGMAS = {
+  'WAL': ('PRAGMA synchronous = NORMAL', ),
+  'ALL': ('PRAGMA cache_size = -8000', 'PRAGMA temp_store = MEMORY'),
+}
+
+
+# The spots are stored in one table per time bucket, named after the
+# epoch minute the bucket starts. Purge drops the expired buckets.
+BUCKET_MINUTES = 5
+
+# Columns of the cqcalls view, the worked and the spots tables
+COLUMNS = ('call', 'extra', 'time', 'status', 'snr', 'grid', 'lat', 'lon', 'distance',
+           'azimuth', 'country', 'continent', 'cqzone', 'ituzone', 'frequency', 'band',
+           'packet')
 
 
 # DBInsert commands.
@@ -23,8 +55,11 @@ class DBCommand(Enum):
   INSERT = 1
   STATUS = 2
   DELETE = 3
+  PURGE = 4
+  SYNC = 5                      # data is an Event, set after the commit
 
 
+# First version of the schema, MIGRATIONS bring it up to date.
 SQL_TABLE = """
 CREATE TABLE IF NOT EXISTS cqcalls
 (
@@ -75,17 +110,6 @@ def get_band(key):
   return _bands[key]
 
 
-class DBJSONEncoder(json.JSONEncoder):
-  """Special JSON encoder capable of encoding sets"""
-  def default(self, o):
-    if isinstance(o, set):
-      return {'__type__': 'set', 'value': list(o)}
-    if isinstance(o, datetime):
-      return {'__type__': 'datetime', 'value': o.timestamp()}
-
-    return super().default(o)
-
-
 class DBJSONDecoder(json.JSONDecoder):
   """Special JSON decoder capable of decoding sets encodes by IJSONEncoder"""
   def __init__(self):
@@ -102,8 +126,91 @@ class DBJSONDecoder(json.JSONDecoder):
     return json_obj
 
 
-sqlite3.register_adapter(dict, DBJSONEncoder().encode)
-sqlite3.register_converter('JSON', lambda x: DBJSONDecoder().decode(x.decode('utf-8')))
+EPOCH = datetime(1970, 1, 1)
+
+
+def datetime2epoch(dtime):
+  """The times are naive UTC datetime, stored as milliseconds since the epoch"""
+  return (dtime - EPOCH) // timedelta(milliseconds=1)
+
+
+def epoch2datetime(value):
+  return EPOCH + timedelta(milliseconds=int(value))
+
+
+class PacketRecord(Mapping):
+  """Decode packet stored in the database. The record is kept in its
+  binary form and only unpacked when one of its fields is read.
+
+  Layout: version, Time (microseconds since the epoch), SNR, DeltaTime,
+  DeltaFrequency, New, LowConfidence, OffAir, Mode, length of Message
+  then Message."""
+
+  VERSION = 1
+  HEADER = struct.Struct('<BqidI???4sB')
+  __slots__ = ('_blob', '_data')
+
+  def __init__(self, blob):
+    self._blob = blob
+    self._data = None
+
+  @classmethod
+  def pack(cls, packet):
+    # pylint: disable=protected-access
+    if isinstance(packet, cls) and packet._data is None:
+      return packet._blob
+    when = packet.get('Time')
+    when = -1 if when is None else (when - EPOCH) // timedelta(microseconds=1)
+    message = packet.get('Message', '').encode('utf-8')[:255]
+    return cls.HEADER.pack(
+      cls.VERSION, when, packet.get('SNR', 0), packet.get('DeltaTime', 0.0),
+      packet.get('DeltaFrequency', 0), packet.get('New', False),
+      packet.get('LowConfidence', False), packet.get('OffAir', False),
+      packet.get('Mode', '').encode('utf-8'), len(message)) + message
+
+  def _load(self):
+    header = self.HEADER
+    (_, when, snr, delta_time, delta_freq, new, low_confidence, off_air, mode,
+     length) = header.unpack_from(self._blob)
+    self._data = {
+      'New': new,
+      'Time': None if when < 0 else EPOCH + timedelta(microseconds=when),
+      'SNR': snr,
+      'DeltaTime': delta_time,
+      'DeltaFrequency': delta_freq,
+      'Mode': mode.rstrip(b'\0').decode('utf-8'),
+      'Message': self._blob[header.size:header.size + length].decode('utf-8'),
+      'LowConfidence': low_confidence,
+      'OffAir': off_air,
+    }
+    return self._data
+
+  def __getitem__(self, key):
+    return (self._data or self._load())[key]
+
+  def __iter__(self):
+    return iter(self._data or self._load())
+
+  def __len__(self):
+    return len(self._data or self._load())
+
+  def __repr__(self):
+    return f'<PacketRecord {dict(self)}>'
+
+
+def convert_packet(blob, _decoder=DBJSONDecoder()):
+  """The packets written before PacketRecord are JSON documents"""
+  if blob[:1] == b'{':
+    return _decoder.decode(blob.decode('utf-8'))
+  return PacketRecord(blob)
+
+
+sqlite3.register_adapter(dict, PacketRecord.pack)
+sqlite3.register_adapter(PacketRecord, PacketRecord.pack)
+sqlite3.register_converter('JSON', convert_packet)
+sqlite3.register_converter('PACKET', convert_packet)
+sqlite3.register_adapter(datetime, datetime2epoch)
+sqlite3.register_converter('EPOCH', epoch2datetime)
 
 
 def connect_db(db_name):
@@ -111,136 +218,441 @@ def connect_db(db_name):
     conn = sqlite3.connect(db_name, timeout=15, detect_types=sqlite3.PARSE_DECLTYPES,
                            isolation_level=None)
     conn.row_factory = sqlite3.Row
+    curs = conn.cursor()
+    journal_mode = curs.execute('PRAGMA journal_mode').fetchone()[0].upper()
+    for pragma in PRAGMAS.get(journal_mode, ()) + PRAGMAS['ALL']:
+      curs.execute(pragma)
   except sqlite3.OperationalError as err:
     logger.error("Database: %s - %s", db_name, err)
     raise SystemExit('Database Error') from None
   return conn
 
 
-def create_db(db_name):
+_readers = local()
+
+
+def read_db(db_name):
+  """Read only connection, kept open and reused by the calling thread"""
+  if not hasattr(_readers, 'pool'):
+    _readers.pool = {}
+  key = str(db_name)
+  if key not in _readers.pool:
+    conn = connect_db(db_name)
+    conn.execute('PRAGMA query_only = ON')
+    _readers.pool[key] = conn
+  return _readers.pool[key]
+
+
+def close_readers():
+  """Close the connections of the calling thread"""
+  for conn in getattr(_readers, 'pool', {}).values():
+    conn.close()
+  _readers.pool = {}
+
+
+def create_db(db_name, journal_mode=JOURNAL_MODE):
   logger.info("Database: %s", db_name)
-  with connect_db(db_name) as conn:
+  journal_mode = journal_mode.upper()
+  if journal_mode not in JOURNAL_MODES:
+    raise ValueError(f'Unknown journal mode "{journal_mode}"')
+  conn = connect_db(db_name)
+  with conn:
     curs = conn.cursor()
+    curs.execute(f'PRAGMA journal_mode = {journal_mode}')
+    logger.info("Database journal mode: %s", curs.fetchone()[0])
+  migrate(conn)
+  conn.close()
+
+
+def migrate(conn):
+  """Bring the schema to the last version. The version is kept in the
+  database user_version, each migration runs in its own transaction."""
+  curs = conn.cursor()
+  version = curs.execute('PRAGMA user_version').fetchone()[0]
+  if version > SCHEMA_VERSION:
+    logger.error('Database schema version %d, this version of ft8ctrl supports %d',
+                 version, SCHEMA_VERSION)
+    raise SystemExit('Database Error')
+  if version == 0:
     curs.executescript(SQL_TABLE)
+  for number, migration in enumerate(MIGRATIONS[version:], version + 1):
+    curs.execute('BEGIN')
+    try:
+      migration(curs)
+      curs.execute(f'PRAGMA user_version = {number}')
+    except BaseException:
+      curs.execute('ROLLBACK')
+      raise
+    curs.execute('COMMIT')
+    logger.info('Database schema migrated to version %d (%s)', number, migration.__doc__)
+
+
+def _packets_to_binary(curs):
+  """packets stored as PacketRecord"""
+  curs.execute("SELECT rowid, packet FROM cqcalls WHERE typeof(packet) = 'text'")
+  rows = [(PacketRecord.pack(packet), rowid) for rowid, packet in curs.fetchall()]
+  curs.executemany('UPDATE cqcalls SET packet = ? WHERE rowid = ?', rows)
+
+
+def _time_to_epoch(curs):
+  """time stored in epoch milliseconds, index on band, status, time"""
+  for statement in SQL_EPOCH_TIME:
+    curs.execute(statement)
+
+
+SQL_EPOCH_TIME = (
+  """CREATE TABLE cqcalls_new
+  (
+    call TEXT,
+    extra TEXT,
+    time EPOCH,
+    status INTEGER,
+    snr INTEGER,
+    grid TEXT,
+    lat REAL,
+    lon REAL,
+    distance REAL,
+    azimuth REAL,
+    country TEXT,
+    continent TEXT,
+    cqzone INTEGER,
+    ituzone INTEGER,
+    frequency INTEGER,
+    band INTEGER,
+    packet PACKET
+  )""",
+  """INSERT INTO cqcalls_new SELECT call, extra,
+  CAST(round((julianday(time) - 2440587.5) * 86400000) AS INTEGER), status, snr, grid, lat,
+  lon, distance, azimuth, country, continent, cqzone, ituzone, frequency, band, packet
+  FROM cqcalls""",
+  "DROP TABLE cqcalls",
+  "ALTER TABLE cqcalls_new RENAME TO cqcalls",
+  "CREATE UNIQUE INDEX idx_call on cqcalls (call, band)",
+  "CREATE INDEX idx_time on cqcalls (time DESC)",
+  "CREATE INDEX idx_band_status_time on cqcalls (band, status, time)",
+)
+
+SQL_SPOTS = (
+  """CREATE TABLE IF NOT EXISTS {table}
+  (
+    call TEXT,
+    extra TEXT,
+    time EPOCH,
+    status INTEGER,
+    snr INTEGER,
+    grid TEXT,
+    lat REAL,
+    lon REAL,
+    distance REAL,
+    azimuth REAL,
+    country TEXT,
+    continent TEXT,
+    cqzone INTEGER,
+    ituzone INTEGER,
+    frequency INTEGER,
+    band INTEGER,
+    packet PACKET
+  )""",
+  "CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_call on {table} (call, band)",
+  "CREATE INDEX IF NOT EXISTS idx_{table}_band on {table} (band, status, time)",
+  "CREATE INDEX IF NOT EXISTS idx_{table}_time on {table} (time)",
+)
+
+
+def _time_buckets(curs):
+  """worked table and time bucketed spots"""
+  create_table(curs, 'worked')
+  curs.execute('INSERT INTO worked SELECT * FROM cqcalls WHERE status = 2')
+  curs.execute('SELECT DISTINCT time / 60000 FROM cqcalls WHERE status < 2')
+  tables = {bucket_name(epoch2datetime(minute * 60000)) for minute, in curs.fetchall()}
+  for table in tables:
+    start = bucket_start(table)
+    create_table(curs, table)
+    curs.execute(f'INSERT INTO {table} SELECT * FROM cqcalls '
+                 'WHERE status < 2 AND time >= ? AND time < ?',
+                 (start, start + timedelta(minutes=BUCKET_MINUTES)))
+  curs.execute('DROP TABLE cqcalls')
+  create_view(curs)
+
+
+MIGRATIONS = (
+  _packets_to_binary,
+  _time_to_epoch,
+  _time_buckets,
+)
+SCHEMA_VERSION = len(MIGRATIONS)
+
+# The queries run while ft8ctrl is working, every table of the cqcalls
+# view must be read through an index.
+HOT_QUERIES = {
+  'candidates': 'SELECT * FROM cqcalls WHERE band = ? AND status = 0 AND time > ? ORDER BY time',
+  'status': 'SELECT * FROM cqcalls WHERE band = ? AND status = ? ORDER BY time',
+  'call': 'SELECT * FROM cqcalls WHERE call = ? AND band = ?',
+  'recent': 'SELECT * FROM cqcalls WHERE time > ?',
+}
+# Index of each table read by the hot queries, idx_{table}_{suffix}
+HOT_INDEXES = {
+  'candidates': 'band',
+  'status': 'band',
+  'call': 'call',
+  'recent': 'time',
+}
+
+
+def bucket_name(when):
+  minutes = datetime2epoch(when) // 60000
+  return f'spots_{minutes - minutes % BUCKET_MINUTES}'
+
+
+def bucket_start(table):
+  return epoch2datetime(int(table.split('_')[1]) * 60000)
+
+
+def bucket_floor(when):
+  """Start of the bucket containing `when`"""
+  return bucket_start(bucket_name(when))
+
+
+def list_buckets(curs, schema='main'):
+  curs.execute(f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table' "
+               "AND name GLOB 'spots_*' ORDER BY name")
+  return [name for name, in curs.fetchall()]
+
+
+def create_table(curs, table):
+  for statement in SQL_SPOTS:
+    curs.execute(statement.format(table=table))
+
+
+def create_view(curs):
+  """The cqcalls view is the union of the worked table and the buckets"""
+  selects = ['SELECT * FROM worked']
+  selects.extend(f'SELECT * FROM {table}' for table in list_buckets(curs))
+  curs.execute('DROP VIEW IF EXISTS cqcalls')
+  curs.execute(f'CREATE VIEW cqcalls AS {" UNION ALL ".join(selects)}')
+
+
+def delete_call(conn, call, band):
+  """Delete `call` on `band` from the worked table and the buckets"""
+  count = 0
+  curs = conn.cursor()
+  curs.execute('BEGIN')
+  for table in ['worked'] + list_buckets(curs):
+    curs.execute(f'DELETE FROM {table} WHERE call = ? AND band = ?', (call, band))
+    count += curs.rowcount
+  curs.execute('COMMIT')
+  return count
+
+
+def query_plan(conn, query):
+  """Return the EXPLAIN QUERY PLAN details of `query`"""
+  params = (None, ) * query.count('?')
+  curs = conn.execute(f'EXPLAIN QUERY PLAN {query}', params)
+  return [row['detail'] for row in curs]
 
 
 def get_call(db_name, call):
   req = "SELECT * FROM cqcalls WHERE call = ?"
-  with connect_db(db_name) as conn:
-    curs = conn.cursor()
-    curs.execute(req, (call,))
-    record = curs.fetchone()
+  curs = read_db(db_name).cursor()
+  curs.execute(req, (call,))
+  record = curs.fetchone()
   return dict(record) if record else {}
 
 
+def _spot_bucket(data):
+  return bucket_name(data.get('time', data['packet']['Time']))
+
+
+def _insert_params(data):
+  packet = data['packet']
+  return (data['call'], data['extra'], data.get('time', packet['Time']), 0, packet['SNR'],
+          data['grid'], data['lat'], data['lon'], data['distance'], data['azimuth'],
+          data['country'], data['continent'], data['cqzone'], data['ituzone'],
+          data['frequency'], data['band'], packet)
+
+
 class DBInsert(Thread):
+  """Write behind the CandidateStore. The records are already enriched.
+
+  The commands available in the queue, or received during `window`
+  seconds, are written in a single transaction. The consecutive commands
+  of the same type are applied together, the order of the commands is
+  kept.
+
+  A spot is written in the bucket of its first decode time. When the
+  station is worked it moves to the worked table.
+
+  When the transaction fails, the commands are written one by one, only
+  the failing commands are lost."""
 
   INSERT = """
-  INSERT INTO cqcalls VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+  INSERT INTO {table} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
   ON CONFLICT(call, band) DO UPDATE SET snr = excluded.snr, packet = excluded.packet
-  WHERE status <> 2
   """
-  UPDATE = "UPDATE cqcalls SET status=? WHERE status <> 2 and call = ? and band = ?"
-  DELETE = "DELETE from cqcalls WHERE status= 1 AND call = ? and band = ?"
+  WORKED = """
+  INSERT OR REPLACE INTO worked VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+  """
+  UPDATE = "UPDATE {table} SET status = ? WHERE call = ? and band = ?"
+  DELETE = "DELETE FROM {table} WHERE status = 1 AND call = ? and band = ?"
+  MOVE = "DELETE FROM {table} WHERE call = ? and band = ?"
 
-  def __init__(self, db_name, queue, grid):
+  MAX_BATCH = 1000
+
+  def __init__(self, db_name, queue, window=BATCH_WINDOW):
     super().__init__()
     self.db_name = db_name
     self.queue = queue
-    self.origin = geo.grid2latlon(grid)
-    self.dxe_lookup = DXEntity.DXCC().lookup
+    self.window = window
+    self.queue_depth = metrics.get_stats('db.queue')
+    self.batch_size = metrics.get_stats('db.batch')
+    self.commit_time = metrics.get_stats('db.commit')
 
   def run(self):
-    # pylint: disable=no-member
-    logger.info('Database Insert thread started')
+    logger.info('Database Insert thread started (batch window %.2fs)', self.window)
     conn = connect_db(self.db_name)
     # Run forever and consume the queue
     while True:
-      cmd, data = self.queue.get()
-      if cmd == DBCommand.INSERT:
-        lat, lon = geo.grid2latlon(data['grid'])
-        data['lat'], data['lon'] = lat, lon
-        data['distance'] = geo.distance(self.origin, (lat, lon))
-        data['azimuth'] = geo.azimuth(self.origin, (lat, lon))
-        try:
-          dxentity = self.dxe_lookup(data['call'])
-          data['country'] = dxentity.country
-          data['continent'] = dxentity.continent
-          data['cqzone'] = dxentity.cqzone
-          data['ituzone'] = dxentity.ituzone
-        except KeyError:
-          logger.error('DXEntity for %s not found, this is probably a fake callsign', data['call'])
-          continue
-        try:
-          DBInsert.write(conn, data)
-        except sqlite3.OperationalError as err:
-          logger.warning("Queue len: %d - Error: %s", self.queue.qsize(), err)
-        except AttributeError as err:
-          logger.error(err)
-          logger.error(data)
-      elif cmd == DBCommand.STATUS:
-        try:
-          DBInsert.status(conn, data)
-        except sqlite3.OperationalError as err:
-          logger.warning("Queue len: %d - Error: %s", self.queue.qsize(), err)
-      elif cmd == DBCommand.DELETE:
-        try:
-          DBInsert.delete(conn, data)
-        except sqlite3.OperationalError as err:
-          logger.warning("Queue len: %d - Error: %s", self.queue.qsize(), err)
+      self.queue_depth.add(self.queue.qsize())
+      batch = self.get_batch()
+      start = time.perf_counter()
+      if self.write_batch(conn, batch):
+        self.commit_time.add((time.perf_counter() - start) * 1000)
+        self.batch_size.add(len(batch))
+      else:
+        self.replay(conn, batch)
+      for cmd, data in batch:
+        if cmd == DBCommand.SYNC:
+          data.set()
+
+  def write_batch(self, conn, batch):
+    """Write the batch in one transaction, retry when the database is busy"""
+    for attempt in range(1, BATCH_ATTEMPTS + 1):
+      try:
+        DBInsert.apply(conn, batch)
+        return True
+      except sqlite3.OperationalError as err:
+        logger.warning("Queue len: %d - Batch: %d - Attempt: %d - Error: %s",
+                       self.queue.qsize(), len(batch), attempt, err)
+      except (AttributeError, KeyError, TypeError, sqlite3.Error) as err:
+        logger.warning("Batch of %d commands: %s", len(batch), err)
+        break
+    return False
 
   @staticmethod
-  def write(conn, call_info):
-    # pylint: disable=no-member
-    data = type('CallInfo', (object, ), call_info)
-    with conn:
-      curs = conn.cursor()
-      curs.execute(DBInsert.INSERT, (
-        data.call, data.extra, data.packet['Time'], 0, data.packet['SNR'], data.grid,
-        data.lat, data.lon, data.distance, data.azimuth, data.country, data.continent,
-        data.cqzone, data.ituzone, data.frequency, data.band, data.packet))
-      if not curs.rowcount:
-        logger.debug("DB Write: already worked %s on %d band", data.call, data.band)
-      else:
-        logger.debug("DB Write: %s, %s, %s, %s", data.call, data.continent, data.grid,
-                     data.country)
+  def replay(conn, batch):
+    """Write the commands one by one, only the failing ones are dropped"""
+    for command in batch:
+      try:
+        DBInsert.apply(conn, [command])
+      except (AttributeError, KeyError, TypeError, sqlite3.Error) as err:
+        logger.error("Command %s dropped: %s - %r", command[0].name, err, command[1])
+
+  def get_batch(self):
+    """Block for the first command, then drain the queue"""
+    batch = [self.queue.get()]
+    deadline = time.monotonic() + self.window
+    while len(batch) < self.MAX_BATCH:
+      try:
+        batch.append(self.queue.get(timeout=max(0, deadline - time.monotonic())))
+      except Empty:
+        break
+    return batch
 
   @staticmethod
-  def status(conn, data):
-    with conn:
-      curs = conn.cursor()
-      curs.execute(DBInsert.UPDATE, (data['status'], data['call'], data['band']))
-      logger.debug("%s (%s, %s, %d)", DBInsert.UPDATE, data['status'], data['call'], data['band'])
+  def apply(conn, batch):
+    """Run the (command, data) of `batch` in one transaction"""
+    handlers = {
+      DBCommand.INSERT: DBInsert.insert_spots,
+      DBCommand.STATUS: DBInsert.update_status,
+      DBCommand.DELETE: DBInsert.delete_spots,
+      DBCommand.PURGE: DBInsert.drop_buckets,
+      DBCommand.SYNC: DBInsert.sync,
+    }
+    curs = conn.cursor()
+    # Take the write lock first. A read transaction upgraded to a write
+    # gets "database is locked" without waiting for the busy timeout.
+    curs.execute('BEGIN IMMEDIATE')
+    try:
+      buckets = set(list_buckets(curs))
+      for cmd, group in groupby(batch, key=itemgetter(0)):
+        handlers[cmd](curs, [data for _, data in group], buckets)
+    except BaseException:
+      curs.execute('ROLLBACK')
+      raise
+    curs.execute('COMMIT')
+
+  @staticmethod
+  def insert_spots(curs, records, buckets):
+    for table, group in groupby(records, key=_spot_bucket):
+      if table not in buckets:
+        create_table(curs, table)
+        buckets.add(table)
+        create_view(curs)
+      curs.executemany(DBInsert.INSERT.format(table=table), [_insert_params(r) for r in group])
+      logger.debug("DB INSERT: %s %d rows", table, curs.rowcount)
+
+  @staticmethod
+  def update_status(curs, records, buckets):
+    """The records are the CandidateStore records after the update"""
+    for record in records:
+      table = bucket_name(record['time'])
+      if record['status'] == 2:
+        curs.execute(DBInsert.WORKED, tuple(record[key] for key in COLUMNS))
+        if table in buckets:
+          curs.execute(DBInsert.MOVE.format(table=table), (record['call'], record['band']))
+      elif table in buckets:
+        curs.execute(DBInsert.UPDATE.format(table=table),
+                     (record['status'], record['call'], record['band']))
+      logger.debug("DB STATUS: %s %s band: %d", record['call'], record['status'], record['band'])
+
+  @staticmethod
+  def delete_spots(curs, records, buckets):
+    for record in records:
+      table = bucket_name(record['time'])
+      if table in buckets:
+        curs.execute(DBInsert.DELETE.format(table=table), (record['call'], record['band']))
+        logger.debug("DB DELETE: %s band: %d", record['call'], record['band'])
 
   @staticmethod
-  def delete(conn, data):
-    with conn:
-      curs = conn.cursor()
-      curs.execute(DBInsert.DELETE, (data['call'], data['band']))
-      logger.debug("%s (%s:%s)", DBInsert.DELETE, data['call'], data['band'])
+  def drop_buckets(curs, befores, buckets):
+    """Drop the buckets before the last purge time"""
+    before = max(befores)
+    expired = [table for table in buckets if bucket_start(table) < before]
+    for table in expired:
+      curs.execute(f'DROP TABLE {table}')
+      buckets.discard(table)
+    if expired:
+      create_view(curs)
+      logger.debug('Purge %d buckets', len(expired))
+
+  @staticmethod
+  def sync(_curs, _events, _buckets):
+    """Nothing to write, the events are set after the commit"""
+
+  @staticmethod
+  def write(conn, call_info):
+    DBInsert.apply(conn, [(DBCommand.INSERT, call_info)])
 
 
 class Purge(Thread):
-  REQ = "DELETE FROM cqcalls WHERE status < 2 AND time < datetime('now','{} minute');"
+  """Expire the spots older than `purge_time` minutes, rounded down to the
+  bucket, from the CandidateStore and the database. With an `archive`,
+  the expired buckets are copied before being dropped."""
 
-  def __init__(self, db_name, purge_time):
+  def __init__(self, queue, purge_time, store=None, archive=None):
     super().__init__()
-    self.db_name = db_name
+    self.queue = queue
+    self.store = store
+    self.archive = archive
     self.purge_time = abs(purge_time) * -1  # make sure we have a negative number
-    self.req = self.REQ.format(self.purge_time)
-    logger.debug(self.req)
 
   def run(self):
-    count = 0
     logger.info('Purge thread started (retry_time %d minutes)', abs(self.purge_time))
-    conn = connect_db(self.db_name)
     while True:
-      with conn:
-        try:
-          curs = conn.cursor()
-          curs.execute(self.req)
-          count = curs.rowcount
-        except sqlite3.OperationalError as err:
-          logger.error(err)
-      logger.debug('Purge %d Records', count)
+      before = bucket_floor(datetime.utcnow() + timedelta(minutes=self.purge_time))
+      if self.store is not None:
+        count = self.store.purge(before)
+        logger.debug('Purge %d candidates', count)
+      if self.archive is None or self.archive.archive(before) is not None:
+        self.queue.put((DBCommand.PURGE, before))
       time.sleep(60)
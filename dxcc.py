@@ -0,0 +1,146 @@
+#
+# BSD 3-Clause License
+#
+# Copyright (c) 2023, Fred W6BSD
+# All rights reserved.
+#
+"""
+Callsign to DXCC entity resolver.
+
+DXEntity keeps the cty.plist prefixes in a dbm file and looks up every
+prefix length of a callsign in it. The resolver loads the prefixes once
+in a trie, saved with marshal next to the cty file. The trie is rebuilt
+when the cty file changes or expires, DXEntity then downloads a new
+one. The recent callsigns are kept in a LRU cache.
+"""
+
+import dbm
+import logging
+import marshal
+import time
+from functools import lru_cache
+
+import DXEntity
+
+TRIE_CACHE = DXEntity.CTY_DB.with_name('cty.trie')
+LRU_SIZE = 2048
+DBM_SUFFIXES = ('.db', '.dat', '.dir', '.bak', '.pag')
+
+END = ''                        # Trie node key holding the record index
+
+logger = logging.getLogger('ft8ctrl.dxcc')
+
+
+class Resolver:
+  """Same lookups as DXEntity.DXCC, one instance per process."""
+  # Singleton class
+
+  def __new__(cls, db_path=DXEntity.CTY_DB, cache=TRIE_CACHE):
+    if hasattr(cls, '_instance') and isinstance(cls._instance, cls):
+      return cls._instance
+
+    instance = super(Resolver, cls).__new__(cls)
+    data = instance.load(cache, db_path)
+    if data is None:
+      # DXEntity downloads the cty file when it is missing or expired
+      DXEntity.DXCC(db_path)
+      data = instance.build(db_path)
+      instance.save(cache, data)
+    instance._trie = data['trie']
+    instance._records = [DXEntity.DXCCRecord(**record) for record in data['records']]
+    instance._entities = data['entities']
+    instance._lookup = lru_cache(maxsize=LRU_SIZE)(instance._resolve)
+    cls._instance = instance
+    return cls._instance
+
+  @staticmethod
+  def signature(db_path):
+    """The dbm module adds its own suffixes to the cty file name"""
+    files = [path for path in db_path.parent.glob(db_path.name + '*')
+             if path.name == db_path.name or path.suffix in DBM_SUFFIXES]
+    return sorted((path.name, path.stat().st_mtime_ns, path.stat().st_size) for path in files)
+
+  @staticmethod
+  def load(cache, db_path):
+    try:
+      with open(cache, 'rb') as fdt:
+        data = marshal.load(fdt)
+    except (OSError, EOFError, ValueError, TypeError) as err:
+      logger.debug('DXCC trie %s: %s', cache, err)
+      return None
+    if not isinstance(data, dict) or data.get('signature') != Resolver.signature(db_path):
+      logger.info('DXCC trie %s out of date', cache)
+      return None
+    if data['age'] + DXEntity.CTY_EXPIRE < time.time():
+      logger.info('DXCC trie %s expired', cache)
+      return None
+    return data
+
+  @staticmethod
+  def build(db_path):
+    trie = {}
+    count = 0
+    records = []
+    index = {}
+    with dbm.open(str(db_path), 'r') as cdb:
+      age = marshal.loads(cdb['__age__'])
+      entities = marshal.loads(cdb['__entities__'])
+      for key in cdb.keys():
+        prefix = key.decode('utf-8')
+        if prefix.startswith('__'):
+          continue
+        record = marshal.loads(cdb[key])
+        signature = tuple(sorted(record.items()))
+        if signature not in index:
+          index[signature] = len(records)
+          records.append(record)
+        node = trie
+        for char in prefix:
+          node = node.setdefault(char, {})
+        node[END] = index[signature]
+        count += 1
+    logger.info('DXCC trie: %d prefixes, %d records', count, len(records))
+    return {'signature': Resolver.signature(db_path), 'age': age,
+            'trie': trie, 'records': records, 'entities': entities}
+
+  @staticmethod
+  def save(cache, data):
+    tmpname = cache.with_suffix('.tmp')
+    try:
+      with open(tmpname, 'wb') as fdt:
+        marshal.dump(data, fdt)
+      tmpname.replace(cache)
+    except OSError as err:
+      logger.warning('DXCC trie %s: %s', cache, err)
+
+  def _resolve(self, call):
+    # The longest prefix of the callsign wins
+    node = self._trie
+    found = None
+    for char in call:
+      node = node.get(char)
+      if node is None:
+        break
+      found = node.get(END, found)
+    if found is None:
+      raise KeyError(f"{call} not found")
+    return self._records[found]
+
+  def lookup(self, call):
+    return self._lookup(call.upper())
+
+  def cache_info(self):
+    return self._lookup.cache_info()
+
+  @property
+  def entities(self):
+    return self._entities
+
+  def isentity(self, country):
+    return country.translate(DXEntity.TRANSLATOR) in self._entities
+
+  def get_entity(self, key):
+    _key = key.translate(DXEntity.TRANSLATOR)
+    if _key in self._entities:
+      return self._entities[_key]
+    raise KeyError(f'Entity {key} not found')
@@ -6,44 +6,78 @@
 # All rights reserved.
 #
 
+import asyncio
 import logging
 import os
-import re
 import select
+import signal
 import socket
+import sqlite3
 import time
 from argparse import ArgumentParser
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
 from importlib import import_module
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
 from queue import Queue
+from threading import Event
 
+import messages
+import metrics
 import wsjtx
+from archive import Archive, create_archive
+from candidates import CallInfo, CandidateStore
+from capture import CaptureWriter
 from config import Config
-from dbutils import DBCommand, DBInsert, Purge, create_db, get_band
+from dbutils import (BATCH_WINDOW, JOURNAL_MODE, DBCommand, DBInsert, Purge,
+                     close_readers, create_db, get_band)
+from plugins.base import Snapshot
 
 SEQUENCE_TIME = {
   'FT8': {2, 17, 32, 47},
   'FT4': {0, 6, 12, 18, 24, 30, 36, 42, 48, 54},
 }
 
-PARSERS = {
-  'REPLY': re.compile(r'^((?!CQ)(?P<to>\w+)(|/\w+)) (?P<call>\w+)(|/\w+) .*'),
-  'CQ': re.compile(r'''^CQ\s(?:CQ\s|(?P<extra>[\S.]+)\s|)
-                   (?P<call>\w+(|/\w+))\s
-                   (?P<grid>[A-Z]{2}[0-9]{2})''', re.VERBOSE),
-  'BROKENCQ': re.compile(r'^CQ\s(?P<call>\w+(|/\w+))$'),
-}
+RECV_BUFFER_SIZE = 1 << 16      # Larger than the largest UDP datagram
+RECV_ARENA_SIZE = 1 << 20       # Room for at least 16 datagrams per wakeup
+METRICS_INTERVAL = 300          # Log the metrics every 5 minutes
+SYNC_TIMEOUT = 5                # Wait for the database writer before a reload
+SNAPSHOT_AGE = timedelta(seconds=7.5)  # Shortest transmit period, FT4
 
 LOGFILE_SIZE = 2 << 20
 LOGFILE_NAME = 'ft8ctrl-debug.log'
 LOG = None
 
 
+class RecvPool:
+  # pylint: disable=too-few-public-methods
+  """Preallocated receive buffer. The datagrams of a batch are views into
+  the same buffer, they are only valid until the next call to drain().
+  Each datagram comes with its own arrival time."""
+
+  def __init__(self, size=RECV_ARENA_SIZE):
+    self._view = memoryview(bytearray(max(size, RECV_BUFFER_SIZE)))
+
+  def drain(self, sock):
+    """Read the pending datagrams until the socket would block"""
+    view = self._view
+    batch = []
+    offset = 0
+    while offset + RECV_BUFFER_SIZE <= len(view):
+      try:
+        nbytes, addr = sock.recvfrom_into(view[offset:offset + RECV_BUFFER_SIZE])
+      except BlockingIOError:
+        break
+      batch.append((view[offset:offset + nbytes], addr, time.time()))
+      offset += nbytes
+    return batch
+
+
 class Sequencer:
   # pylint: disable=too-many-instance-attributes
-  def __init__(self, config, queue, call_select):
+  def __init__(self, config, queue, call_select, capture=None):
     self.mycall = config.my_call
     self.queue = queue
     self.selector = call_select
@@ -60,35 +94,53 @@ class Sequencer:
     self.logger_ip = getattr(config, 'logger_ip', None)
     self.logger_port = getattr(config, 'logger_port', None)
     self.logger_socket = None
+    self.encoder = wsjtx.ReplyEncoder()
+    self.recv_pool = RecvPool()
+    self.recv_batch = metrics.get_stats('recv.batch')
+    self.recv_latency = metrics.get_stats('recv.latency')
+    self.capture = capture
+
+    self.ip_from = None
+    self.tx_status = False
+    self.frequency = 0
+    self.current = None
+    self.current_retries = 0
+    self.last_tx_message = ""
+    self.sequence = set()
+    self.decoding = False
+    self.decode_time = None
+    self.prepared = None
+    self.prepared_hits = metrics.get_stats('select.prepared')
+    self.store = CandidateStore()
+    self.call_info = CallInfo(config.my_grid)
+    self.db_name = Path(config.db_name).expanduser()
+    self.reload_requested = False
+
+  def call_station(self, ip_from, data, slot=None):
+    pkt = data['packet']
+    if self.follow_frequency:
+      modifiers = wsjtx.Modifiers.SHIFT
+    else:
+      modifiers = wsjtx.Modifiers.NoModifier
+    try:
+      reply = self.encoder.reply(data['time'], data['snr'], pkt['DeltaTime'],
+                                 pkt['DeltaFrequency'], pkt['Mode'], pkt['Message'],
+                                 modifiers=modifiers)
+      self.sock.sendto(reply, ip_from)
+    except IOError as err:
+      LOG.error("%s - %r", err, data)
+      return
+    if slot:
+      LOG.debug('Reply sent %.1f ms after the slot boundary', slot_latency(slot))
 
-  def call_station(self, ip_from, data):
     LOG.info(('Calling: %s (%s), From: %s, SNR: %d, Distance: %d, Band: %dm '
              '- %s - https://www.qrz.com/db/%s'),
              data['call'], data['extra'], data['country'], data['snr'], data['distance'],
              data['band'], data['selector'], data['call'])
-    pkt = data['packet']
-    packet = wsjtx.WSReply()
-    packet.call = data['call']
-    packet.Time = data['time']
-    packet.SNR = data['snr']
-    packet.DeltaTime = pkt['DeltaTime']
-    packet.DeltaFrequency = pkt['DeltaFrequency']
-    packet.Mode = pkt['Mode']
-    packet.Message = pkt['Message']
-    if self.follow_frequency:
-      packet.Modifiers = wsjtx.Modifiers.SHIFT
-
-    LOG.debug('Transmitting %s', packet)
-    try:
-      self.sock.sendto(packet.raw(), ip_from)
-    except IOError as err:
-      LOG.error("%s - %r", err, packet)
 
   def stop_transmit(self, ip_from):
-    stop_pkt = wsjtx.WSHaltTx()
-    stop_pkt.tx = True
     try:
-      self.sock.sendto(stop_pkt.raw(), ip_from)
+      self.sock.sendto(self.encoder.halt_tx(), ip_from)
     except socket.error as err:
       LOG.error(err)
 
@@ -102,116 +154,308 @@ class Sequencer:
     self.logger_socket.sendto(packet.raw(), (self.logger_ip, self.logger_port))
 
   def parser(self, message):
-    for name, regexp in PARSERS.items():
-      if not (match := regexp.match(message)):
-        continue
-      data = match.groupdict()
-      if name == 'BROKENCQ':
-        name = 'CQ'
-        data['extra'] = data['grid'] = None
-      elif name == 'CQ':
-        LOG.debug("%s = %r, %s", name, data, message)
-      return (name, data)
-    LOG.debug('Unmatched: %s', message)
-    return (None, None)
+    msg = messages.parse(message)
+    if msg is None:
+      LOG.debug('Unmatched: %s', message)
+    elif msg.kind == messages.MessageType.CQ:
+      LOG.debug("%r, %s", msg, message)
+    return msg
 
   def log_call(self, packet):
     self.sendto_log(packet)
-    frequency = packet.DialFrequency
-    self.queue.put(
-      (DBCommand.STATUS, {"call": packet.DXCall, "status": 2, "band": get_band(frequency)})
-    )
+    self.set_status(packet.DXCall, get_band(packet.DialFrequency), 2)
     LOG.info("** Logged call: %s, Grid: %s, Mode: %s",
              packet.DXCall, packet.DXGrid, wsjtx.Mode(packet.Mode).name)
 
   def decode(self, packet):
     try:
       return self.parser(packet.Message)
-    except TypeError as err:
+    except (TypeError, AttributeError) as err:
       LOG.error('Error: %s - Message: %s', err, packet.Message)
-    return (None, None)
+    return None
+
+  def process(self, packet, ip_from):
+    # pylint: disable=too-many-branches
+    self.ip_from = ip_from
+    match packet:
+      case wsjtx.WSHeartbeat() | wsjtx.WSADIF():
+        pass
+      case wsjtx.WSLogged():
+        self.log_call(packet)
+        self.current = None
+      case wsjtx.WSDecode():
+        if packet.New:
+          self.decode_time = packet.Time   # Beginning of the cycle being decoded
+        msg = self.decode(packet)
+        if msg is None:
+          return
+        if msg.directed and msg.call == self.current and msg.to != self.mycall:
+          LOG.info("Stop Transmit: %s Replying to %s ", msg.call, msg.to)
+          self.stop_transmit(ip_from)
+          band = get_band(self.frequency)
+          if record := self.store.delete(msg.call, band):
+            self.queue.put((DBCommand.DELETE, record))
+        elif msg.kind in (messages.MessageType.CQ, messages.MessageType.DXCQ):
+          self.add_candidate(msg, packet)
+      case wsjtx.WSStatus():
+        # WSJT-X will sometimes send multiple status packets where Transmitting is
+        # True for the same transmission.
+        # Checking Decoding here prevents increases in retries for the same transmission.
+        tx = not packet.Decoding and packet.Transmitting
+        if tx and self.last_tx_message == packet.TxMessage:
+          if self.current_retries >= self.tx_retries:
+            LOG.info("Retries exceeded, stopping transmit")
+            self.stop_transmit(ip_from)
+            self.current_retries = 0
+            return
+        elif tx and self.last_tx_message != packet.TxMessage:
+          self.current_retries = 0
+
+        if tx:
+          self.current_retries += 1
+          self.last_tx_message = packet.TxMessage
+
+        self.sequence = SEQUENCE_TIME[packet.TXMode]
+        self.frequency = packet.Frequency
+        self.tx_status = any([packet.Transmitting, packet.TXEnabled])
+        if (packet.Transmitting and packet.DXCall):
+          self.set_status(packet.DXCall, get_band(self.frequency), 1)
+        if self.decoding and not packet.Decoding and not self.tx_status:
+          self.decode_complete(self.decode_time)
+        self.decoding = packet.Decoding
+        if packet.DXCall:
+          LOG.debug("%s => TX: %s, TXEnabled: %s - TXWatchdog: %s", packet.DXCall,
+                    packet.Transmitting, packet.TXEnabled, packet.TXWatchdog)
+      case _:
+        LOG.debug('Packet type "%r" not processed', packet)
+
+  def add_candidate(self, msg, packet):
+    data = {
+      'call': msg.call,
+      'extra': msg.extra,
+      'grid': msg.grid,
+      'frequency': self.frequency,
+      'band': get_band(self.frequency),
+      'packet': packet.as_dict(),
+    }
+    if self.call_info(data) and (record := self.store.insert(data)):
+      self.queue.put((DBCommand.INSERT, record))
+
+  def set_status(self, call, band, status):
+    if record := self.store.status(call, band, status):
+      self.queue.put((DBCommand.STATUS, record))
+
+  def decode_complete(self, cycle):
+    self.prepare(cycle)
+
+  def prepare(self, cycle):
+    """Select a station as soon as the decodes of the cycle are complete. The
+    choice is held until the transmit slot."""
+    self.prepared = (cycle, self.select())
+
+  def select(self):
+    return self.selector(get_band(self.frequency), self.decode_time)
+
+  def take_prepared(self, slot):
+    """Return (True, data) if a station has been selected from the cycle
+    just before this slot, otherwise (False, None)"""
+    prepared, self.prepared = self.prepared, None
+    if not prepared or not prepared[0] or not self.sequence:
+      self.prepared_hits.add(0)
+      return False, None
+    cycle, data = prepared
+    period = 60 / len(self.sequence)
+    if not 0 < (slot - cycle).total_seconds() < 2 * period:
+      self.prepared_hits.add(0)
+      return False, None
+    self.prepared_hits.add(1)
+    return True, data
+
+  def transmit(self, slot):
+    ready, data = self.take_prepared(slot)
+    if not ready:
+      data = self.select()
+    self.reply(data, slot)
+
+  def reply(self, data, slot):
+    if data:
+      self.call_station(self.ip_from, data, slot)
+      self.selector.invalidate()
+      self.current = data.get('call')
+      self.current_retries = 0
+    else:
+      self.current = None
+
+  def request_reload(self, _signum=None, _frame=None):
+    """SIGHUP handler, the store is reloaded by the main loop"""
+    self.reload_requested = True
+
+  def reload_store(self):
+    """Reload the candidates after the database has been changed by another
+    process, like lookup.py --delete. The queued commands are written first."""
+    self.reload_requested = False
+    written = Event()
+    self.queue.put((DBCommand.SYNC, written))
+    if not written.wait(SYNC_TIMEOUT):
+      LOG.warning('Database writer busy, the candidates are not reloaded')
+      return
+    try:
+      self.store.load(self.db_name)
+    except sqlite3.Error as err:
+      LOG.error('Reload %s: %s', self.db_name, err)
 
   def run(self):
-    # pylint: disable=too-many-locals,too-many-branches,too-many-statements
-    ip_from = None
-    tx_status = False
-    frequency = 0
-    current = None
-    current_retries = 0
-    last_tx_message = ""
-    sequence = []
+    next_report = time.monotonic() + METRICS_INTERVAL
+    if hasattr(signal, 'SIGHUP'):
+      signal.signal(signal.SIGHUP, self.request_reload)
     LOG.info('ft8ctl running...')
 
     while True:
+      batch = []
       fds, _, _ = select.select([self.sock], [], [], .7)
-      for fdin in fds:
-        rawdata, ip_from = fdin.recvfrom(1024)
-        packet = wsjtx.ft8_decode(rawdata)
-        match packet:
-          case wsjtx.WSHeartbeat() | wsjtx.WSADIF():
-            pass
-          case wsjtx.WSLogged():
-            self.log_call(packet)
-            current = None
-          case wsjtx.WSDecode():
-            name, match = self.decode(packet)
-            if name == 'REPLY' and match['call'] == current and match['to'] != self.mycall:
-              LOG.info("Stop Transmit: %s Replying to %s ", match['call'], match['to'])
-              self.stop_transmit(ip_from)
-              self.queue.put((DBCommand.DELETE,
-                              {"call": match['call'], "band": get_band(frequency)}))
-            elif name == 'CQ':
-              match['frequency'] = frequency
-              match['band'] = get_band(frequency)
-              match['packet'] = packet.as_dict()
-              self.queue.put((DBCommand.INSERT, match))
-            continue
-          case wsjtx.WSStatus():
-            # WSJT-X will sometimes send multiple status packets where Transmitting is
-            # True for the same transmission.
-            # Checking Decoding here prevents increases in retries for the same transmission.
-            tx = not packet.Decoding and packet.Transmitting
-            if tx and last_tx_message == packet.TxMessage:
-              if current_retries >= self.tx_retries:
-                LOG.info("Retries exceeded, stopping transmit")
-                self.stop_transmit(ip_from)
-                current_retries = 0
-                continue
-            elif tx and last_tx_message != packet.TxMessage:
-              current_retries = 0
-
-            if tx:
-              current_retries += 1
-              last_tx_message = packet.TxMessage
-
-            sequence = SEQUENCE_TIME[packet.TXMode]
-            frequency = packet.Frequency
-            tx_status = any([packet.Transmitting, packet.TXEnabled])
-            if (packet.Transmitting and packet.DXCall):
-              self.queue.put(
-                (DBCommand.STATUS,
-                 {"call": packet.DXCall, "status": 1, "band": get_band(frequency)})
-              )
-            if packet.DXCall:
-              LOG.debug("%s => TX: %s, TXEnabled: %s - TXWatchdog: %s", packet.DXCall,
-                        packet.Transmitting, packet.TXEnabled, packet.TXWatchdog)
-          case _:
-            LOG.debug('Packet type "%r" not processed', packet)
+      if fds:
+        batch = self.recv_pool.drain(self.sock)
+        self.recv_batch.add(len(batch))
+        if self.capture:
+          for rawdata, _, arrival in batch:
+            self.capture.write(rawdata, arrival)
+      for rawdata, ip_from, arrival in batch:
+        self.recv_latency.add((time.time() - arrival) * 1000)
+        self.process(wsjtx.ft8_decode(rawdata), ip_from)
 
       # Outside the for loop
-      if not tx_status:
+      if self.reload_requested:
+        self.reload_store()
+
+      if time.monotonic() > next_report:
+        metrics.log_report()
+        next_report = time.monotonic() + METRICS_INTERVAL
+
+      if not self.tx_status:
         _now = datetime.utcnow()
-        if _now.second in sequence:
-          data = self.selector(get_band(frequency))
-          if data:
-            self.call_station(ip_from, data)
-            current = data.get('call')
-            current_retries = 0
-          else:
-            current = None
+        if _now.second in self.sequence:
+          self.transmit(_now.replace(microsecond=0))
           time.sleep(1)
 
 
+class WSJTXProtocol(asyncio.DatagramProtocol):
+  """Hand the datagrams received from WSJT-X to the sequencer"""
+
+  def __init__(self, sequencer):
+    self.sequencer = sequencer
+
+  def datagram_received(self, data, addr):
+    if self.sequencer.capture:
+      self.sequencer.capture.write(data, time.time())
+    self.sequencer.process(wsjtx.ft8_decode(data), addr)
+
+  def error_received(self, exc):
+    LOG.error('WSJT-X socket: %s', exc)
+
+
+class AsyncSequencer(Sequencer):
+  """Event loop version of the Sequencer. The packets are processed as
+  soon as they arrive, and the transmit decision is scheduled with
+  loop.call_at() on the slot boundary. The selectors query the database,
+  they run in a worker thread to keep receiving during the selection."""
+
+  def __init__(self, config, queue, call_select, capture=None):
+    super().__init__(config, queue, call_select, capture)
+    self.loop = None
+    self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='selector')
+    self.slot_timer = None
+    self.select_task = None
+
+  def run(self):
+    asyncio.run(self.main())
+
+  async def main(self):
+    self.loop = asyncio.get_running_loop()
+    transport, _ = await self.loop.create_datagram_endpoint(
+      lambda: WSJTXProtocol(self), sock=self.sock
+    )
+    if hasattr(signal, 'SIGHUP'):
+      self.loop.add_signal_handler(signal.SIGHUP, self.request_reload)
+    LOG.info('ft8ctl running (asyncio)...')
+    self.schedule_slot()
+    try:
+      while True:
+        await asyncio.sleep(METRICS_INTERVAL)
+        metrics.log_report()
+    finally:
+      self.slot_timer.cancel()
+      transport.close()
+      self.executor.submit(close_readers)
+      self.executor.shutdown(wait=False)
+
+  def request_reload(self, _signum=None, _frame=None):
+    """Called by the event loop, the selector thread waits for the
+    database writer and reloads the store between two selections"""
+    self.loop.run_in_executor(self.executor, self.reload_store)
+
+  def schedule_slot(self, after=None):
+    if not self.sequence:
+      # No status packet from WSJT-X yet, we don't know the mode.
+      self.slot_timer = self.loop.call_later(1, self.schedule_slot)
+      return
+    slot = next_slot(self.sequence, after)
+    when = self.loop.time() + slot - time.time()
+    self.slot_timer = self.loop.call_at(when, self.on_slot, slot)
+
+  def decode_complete(self, cycle):
+    future = self.loop.run_in_executor(self.executor, self.select)
+    future.add_done_callback(partial(self.prepared_done, cycle))
+
+  def prepared_done(self, cycle, future):
+    """Called in the event loop thread, `prepared` is only used by the loop"""
+    if not selection_error(future):
+      self.prepared = (cycle, future.result())
+
+  def on_slot(self, slot):
+    self.schedule_slot(slot)
+    if self.tx_status:
+      return
+    slot = datetime.utcfromtimestamp(slot)
+    ready, data = self.take_prepared(slot)
+    if ready:
+      self.reply(data, slot)
+    else:
+      self.select_task = self.loop.create_task(self.select_reply(slot))
+      self.select_task.add_done_callback(selection_error)
+
+  async def select_reply(self, slot):
+    data = await self.loop.run_in_executor(self.executor, self.select)
+    if self.tx_status:
+      return                    # WSJT-X started transmitting during the selection
+    self.reply(data, slot)
+
+
+def selection_error(future):
+  """Log the exception of a selection. Return True if it didn't complete"""
+  if future.cancelled():
+    return True
+  if (err := future.exception()) is not None:
+    LOG.error('Call selection error: %r', err, exc_info=err)
+    return True
+  return False
+
+
+def next_slot(sequence, now=None):
+  """Epoch time of the first transmit slot after `now`"""
+  if now is None:
+    now = time.time()
+  minute = now - now % 60
+  for second in sorted(sequence):
+    if minute + second > now:
+      return minute + second
+  return minute + 60 + min(sequence)
+
+
+def slot_latency(slot):
+  """Milliseconds elapsed since the beginning of the transmit slot"""
+  return (datetime.utcnow() - slot).total_seconds() * 1000
+
+
 class LoadPlugins:
 
   def __init__(self, plugins):
@@ -231,13 +475,31 @@ class LoadPlugins:
         LOG.error('Call selector plugin %s not found', class_name)
         raise SystemExit(f'"{class_name}" not found') from None
       self.call_select.append(klass())
-
-  def __call__(self, band):
+    self.delta = max(selector.delta for selector in self.call_select)
+    self.store = CandidateStore()
+    self.snapshot = None
+
+  def get_snapshot(self, band, cycle):
+    """The candidates are read once per decode cycle and band. They are
+    read again when the store has changed, a station called or logged,
+    or when the snapshot is older than one transmit period."""
+    snapshot = self.snapshot
+    if (cycle is None or snapshot is None or (snapshot.band, snapshot.cycle) != (band, cycle)
+        or snapshot.version != self.store.version
+        or datetime.utcnow() - snapshot.time > SNAPSHOT_AGE):
+      snapshot = self.snapshot = Snapshot(band, cycle, self.delta)
+    return snapshot
+
+  def invalidate(self):
+    self.snapshot = None
+
+  def __call__(self, band, cycle=None):
+    snapshot = self.get_snapshot(band, cycle)
     for selector in self.call_select:
-      data = selector.get(band)
+      data = selector.get(snapshot)
       if not data:
         continue
-      data['selector'] = selector.__class__.__name__
+      data = dict(data, selector=selector.__class__.__name__)
       LOG.debug('Select: %s, From: %s, SNR: %d, Distance: %dKm, Band: %dm, Selector: %s',
                 data['call'], data['country'], data['snr'], data['distance'],
                 data['band'], data['selector'])
@@ -257,10 +519,13 @@ def get_log_level():
 
 
 def main():
-  # pylint: disable=global-statement
+  # pylint: disable=global-statement,too-many-locals,too-many-statements
   global LOG
   parser = ArgumentParser(description="ft8ctl wsjt-x automation")
   parser.add_argument("-c", "--config", help="Name of the configuration file")
+  parser.add_argument("--capture", help="Append the packets received from WSJT-X to this file")
+  parser.add_argument("--asyncio", action="store_true",
+                      help="Run the sequencer on an asyncio event loop")
   opts = parser.parse_args()
 
   config = Config(opts.config)
@@ -285,29 +550,54 @@ def main():
   LOG.addHandler(file_handler)
 
   db_name = Path(config.db_name).expanduser()
-  create_db(db_name)
+  try:
+    create_db(db_name, getattr(config, 'db_journal_mode', JOURNAL_MODE))
+  except ValueError as err:
+    LOG.error('Configuration error: %s', err)
+    raise SystemExit('Config error') from None
+
+  store = CandidateStore()
+  store.load(db_name)
 
   queue = Queue()
-  try:
-    db_thread = DBInsert(db_name, queue, config.my_grid)
-    db_thread.daemon = True
-    db_thread.start()
-  except RuntimeError as err:
-    LOG.error("Configuration error: %s", err)
-    raise SystemExit('Configuration Error') from None
+  db_thread = DBInsert(db_name, queue, getattr(config, 'db_batch_window', BATCH_WINDOW))
+  db_thread.daemon = True
+  db_thread.start()
+
+  archive = None
+  if getattr(config, 'archive_name', None):
+    archive_name = Path(config.archive_name).expanduser()
+    create_archive(archive_name)
+    archive = Archive(db_name, archive_name)
 
-  db_purge = Purge(db_name, config.retry_time)
+  db_purge = Purge(queue, config.retry_time, store, archive)
   db_purge.daemon = True
   db_purge.start()
 
+  capture = None
+  if opts.capture:
+    capture = CaptureWriter(Path(opts.capture).expanduser())
+    LOG.info('Capture WSJT-X packets into %s', capture.filename)
+
   call_select = LoadPlugins(config.call_selector)
+  if opts.asyncio or getattr(config, 'asyncio', False):
+    sequencer = AsyncSequencer
+  else:
+    sequencer = Sequencer
   try:
-    main_loop = Sequencer(config, queue, call_select)
+    main_loop = sequencer(config, queue, call_select, capture)
     main_loop.run()
+  except RuntimeError as err:
+    LOG.error("Configuration error: %s", err)
+    raise SystemExit('Configuration Error') from None
   except OSError as err:
     LOG.error('%s - %s', config.wsjt_ip, err.strerror)
   except KeyboardInterrupt:
     LOG.info('^C pressed exiting')
+  finally:
+    close_readers()
+    if capture:
+      capture.close()
 
 
 if __name__ == '__main__':
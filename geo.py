@@ -9,8 +9,27 @@
 Spherical geometry
 """
 
+import logging
 import math
+import os
+from array import array
 from functools import lru_cache
+from pathlib import Path
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+GEO_CACHE = Path('/tmp/geo_cache')
+
+# 18 fields x 18 fields x 10 squares x 10 squares
+SQUARES = 18 * 18 * 10 * 10
+
+logger = logging.getLogger('ft8ctrl.geo')
+
+
+EARTH_RADIUS = 6371  # Earth radius in km
 
 
 def haversine(val):
@@ -20,7 +39,7 @@ def haversine(val):
 
 def distance(orig, dest):
   """Calculate the distance between 2 coordinates"""
-  radius = 6371  # Earth radius in meters
+  radius = EARTH_RADIUS
   lat1, lon1 = orig
   lat2, lon2 = dest
 
@@ -77,3 +96,132 @@ def grid2latlon(maiden):
     lat += int(maiden[7]) * 2.5 / 600
 
   return lat, lon
+
+
+def grids2latlon(grids):
+  """Lists of the latitudes and longitudes of a sequence of locators"""
+  if numpy is None:
+    points = [grid2latlon.__wrapped__(grid) for grid in grids]
+    return [pt[0] for pt in points], [pt[1] for pt in points]
+
+  # Pad every locator to 8 characters with values adding nothing, then
+  # follow the same steps as grid2latlon on all of them.
+  grids = [grid.strip().upper() if grid else '' for grid in grids]
+  lengths = numpy.fromiter(map(len, grids), dtype=int, count=len(grids))
+  if not numpy.isin(lengths, (0, 2, 4, 6, 8)).all():
+    raise RuntimeError('Locator length error: 2, 4, 6 or 8 characters accepted')
+  chars = numpy.frombuffer(''.join(grid + 'AA00AA00'[len(grid):] for grid in grids).encode(),
+                           dtype=numpy.uint8).reshape(-1, 8).astype(float)
+  lons = numpy.full(len(grids), -180.0)
+  lats = numpy.full(len(grids), -90.0)
+  lons += (chars[:, 0] - 65) * 20
+  lats += (chars[:, 1] - 65) * 10
+  lons += (chars[:, 2] - 48) * 2
+  lats += chars[:, 3] - 48
+  lons += (chars[:, 4] - 65) * 5.0 / 60
+  lats += (chars[:, 5] - 65) * 2.5 / 60
+  lons += (chars[:, 6] - 48) * 5.0 / 600
+  lats += (chars[:, 7] - 48) * 2.5 / 600
+  lats[lengths == 0] = lons[lengths == 0] = 0
+  return lats.tolist(), lons.tolist()
+
+
+def distances(orig, lats, lons):
+  """Distances from `orig` to each point, same formula as distance()"""
+  if numpy is None:
+    return [distance(orig, dest) for dest in zip(lats, lons)]
+  phi1, lambda1 = numpy.radians(orig)
+  phi2, lambda2 = numpy.radians(lats), numpy.radians(lons)
+  axr = (numpy.sin((phi2 - phi1) / 2) ** 2
+         + numpy.cos(phi1) * numpy.cos(phi2) * numpy.sin((lambda2 - lambda1) / 2) ** 2)
+  return (2 * EARTH_RADIUS * numpy.arctan2(numpy.sqrt(axr), numpy.sqrt(1 - axr))).tolist()
+
+
+def azimuths(orig, lats, lons):
+  """Direction of each point from `orig`, same formula as azimuth()"""
+  # pylint: disable=invalid-name
+  if numpy is None:
+    return [azimuth(orig, dest) for dest in zip(lats, lons)]
+  phi1, lambda1 = numpy.radians(orig)
+  phi2, d_lon = numpy.radians(lats), numpy.radians(lons) - lambda1
+  x = numpy.cos(phi2) * numpy.sin(d_lon)
+  y = numpy.cos(phi1) * numpy.sin(phi2) - numpy.sin(phi1) * numpy.cos(phi2) * numpy.cos(d_lon)
+  return numpy.abs(numpy.degrees(numpy.arctan2(x, y)).astype(int)).tolist()
+
+
+def square_index(maiden):
+  """Index of a 4 character grid square, None for the other locators"""
+  if len(maiden) != 4:
+    return None
+  field1, field2 = ord(maiden[0]) - 65, ord(maiden[1]) - 65
+  square1, square2 = ord(maiden[2]) - 48, ord(maiden[3]) - 48
+  if not (0 <= field1 < 18 and 0 <= field2 < 18 and 0 <= square1 < 10 and 0 <= square2 < 10):
+    return None
+  return ((field1 * 18 + field2) * 10 + square1) * 10 + square2
+
+
+def square_name(index):
+  index, square2 = divmod(index, 10)
+  index, square1 = divmod(index, 10)
+  field1, field2 = divmod(index, 18)
+  return f'{chr(field1 + 65)}{chr(field2 + 65)}{square1}{square2}'
+
+
+class GeoTable:
+  """Latitude, longitude, distance and azimuth from the `origin` grid to
+  every 4 character square. The table is computed once, with the batch
+  functions, and saved in GEO_CACHE. The other locators are computed on
+  each call."""
+
+  def __init__(self, origin, cache=GEO_CACHE):
+    self.origin = origin.strip().upper()
+    self.latlon = grid2latlon(self.origin)
+    self.filename = Path(cache).joinpath(f'geo-{self.origin}.dat') if cache else None
+    self.lat, self.lon = array('d'), array('d')
+    self.distance, self.azimuth = array('d'), array('H')
+    if not self.load():
+      self.build()
+      self.save()
+
+  def build(self):
+    lats, lons = grids2latlon([square_name(index) for index in range(SQUARES)])
+    self.lat.extend(lats)
+    self.lon.extend(lons)
+    self.distance.extend(distances(self.latlon, lats, lons))
+    self.azimuth.extend(azimuths(self.latlon, lats, lons))
+    logger.debug('Geo table for %s computed', self.origin)
+
+  def load(self):
+    if not self.filename:
+      return False
+    try:
+      with open(self.filename, 'rb') as fdg:
+        for column in (self.lat, self.lon, self.distance, self.azimuth):
+          column.fromfile(fdg, SQUARES)
+    except (OSError, EOFError) as err:
+      logger.debug('Geo table %s: %s', self.filename, err)
+      for column in (self.lat, self.lon, self.distance, self.azimuth):
+        del column[:]
+      return False
+    return True
+
+  def save(self):
+    if not self.filename:
+      return
+    tmpname = self.filename.with_suffix('.tmp')
+    try:
+      self.filename.parent.mkdir(parents=True, exist_ok=True)
+      with open(tmpname, 'wb') as fdg:
+        for column in (self.lat, self.lon, self.distance, self.azimuth):
+          column.tofile(fdg)
+      os.replace(tmpname, self.filename)
+    except OSError as err:
+      logger.warning('Geo table %s: %s', self.filename, err)
+
+  def lookup(self, maiden):
+    """Return (lat, lon, distance, azimuth) of `maiden` from the origin"""
+    index = square_index(maiden) if maiden else None
+    if index is None:
+      lat, lon = grid2latlon(maiden)
+      return lat, lon, distance(self.latlon, (lat, lon)), azimuth(self.latlon, (lat, lon))
+    return self.lat[index], self.lon[index], self.distance[index], self.azimuth[index]
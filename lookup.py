@@ -18,16 +18,14 @@ from pathlib import Path
 import tabulate
 
 from config import Config
-from dbutils import connect_db
-from plugins.base import LOTW
+from dbutils import connect_db, delete_call, read_db
+from lotw import LOTW
 
 RUN_TIME = 30
 
 KEYS = ['call', 'status', 'band', 'snr', 'grid', 'cqzone', 'ituzone', 'country', 'continent',
         'time', 'extra']
 
-REQ_DEL = 'DELETE FROM cqcalls WHERE call = ? AND band = ?'
-
 
 def dict_factory(cursor, row):
   data = {}
@@ -52,18 +50,17 @@ def find(dbname, what, var, band=None):
   req.append(' ORDER BY time ASC')
 
   lotw = LOTW()
-  conn = connect_db(dbname)
-  conn.row_factory = dict_factory
+  conn = read_db(dbname)
   if what == 'call':
     conn.create_function('regexp', 2, regexp)
 
   try:
-    with conn:
-      curs = conn.cursor()
-      curs.execute(' '.join(req), (var, band))
-      for record in curs:
-        record['lotw'] = record['call'] in lotw
-        yield record
+    curs = conn.cursor()
+    curs.row_factory = dict_factory
+    curs.execute(' '.join(req), (var, band))
+    for record in curs:
+      record['lotw'] = record['call'] in lotw
+      yield record
   except sqlite3.OperationalError as err:
     raise SystemError(err) from None
 
@@ -71,29 +68,30 @@ def find(dbname, what, var, band=None):
 def delete_record(dbname, call, band):
   call = call.upper()
   conn = connect_db(dbname)
-  with conn:
-    curs = conn.cursor()
-    curs.execute(REQ_DEL, (call, band))
-  action = 'Deleted' if curs.rowcount > 0 else 'Not found'
+  count = delete_call(conn, call, band)
+  conn.close()
+  action = 'Deleted' if count > 0 else 'Not found'
   print(f'{call} on {band}m band - {action}')
+  if count > 0:
+    print('A running ft8ctrl keeps its candidates in memory, reload them with: '
+          'pkill -HUP -f ft8ctrl.py')
 
 
 def run(dbname, delta=RUN_TIME):
   lotw = LOTW()
   req = f'SELECT {",".join(KEYS)} FROM cqcalls WHERE time > ?'
-  conn = connect_db(dbname)
-  conn.row_factory = dict_factory
+  conn = read_db(dbname)
 
   def fetch():
     start = datetime.utcnow() - timedelta(seconds=delta)
-    with conn:
-      curs = conn.cursor()
-      curs.execute(req, (start, ))
-      records = []
-      for record in curs:
-        record['lotw'] = record['call'] in lotw
-        records.append(record)
-      return records
+    curs = conn.cursor()
+    curs.row_factory = dict_factory
+    curs.execute(req, (start, ))
+    records = []
+    for record in curs:
+      record['lotw'] = record['call'] in lotw
+      records.append(record)
+    return records
 
   clear()
   while True:
@@ -119,7 +117,7 @@ def main():
   parser.add_argument("-C", "--config", help="Name of the configuration file")
   exgroup = parser.add_mutually_exclusive_group(required=True)
   exgroup.add_argument("-d", "--delete", type=type_call,
-                       help="Delete entry args are call band")
+                       help="Delete entry args are call band, then send SIGHUP to ft8ctrl")
   exgroup.add_argument("-r", "--run", type=int, nargs='*',
                        help=f"Run continuously every [default: {RUN_TIME}] seconds")
   exgroup.add_argument('-c', '--call', type=type_call,
@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+#
+# BSD 3-Clause License
+#
+# Copyright (c) 2023, Fred W6BSD
+# All rights reserved.
+#
+"""
+LOTW users and the date of their last upload.
+
+The ARRL activity file is compiled into a sorted file of fixed width
+records, behind a Bloom filter. The file is memory-mapped, shared by
+ft8ctrl and lookup.py, and searched with a binary search. All the users
+are kept, the LOTW_LASTSEEN cutoff is applied by the lookups.
+
+When the index is missing or expired, a background thread downloads the
+activity file and replaces the index. The lookups use the old index, or
+answer False when there is none, until the new one is ready.
+  python lotw.py --refresh --url file:///tmp/lotw-user-activity.csv W6BSD
+"""
+
+import hashlib
+import logging
+import mmap
+import os
+import ssl
+import struct
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from bisect import bisect_left
+from datetime import date
+from pathlib import Path
+from threading import Thread
+from urllib import request
+
+LOTW_URL = 'https://lotw.arrl.org/lotw-user-activity.csv'
+LOTW_CACHE = Path('/tmp/lotw_cache.idx')
+LOTW_EXPIRE = 7 * 86400
+LOTW_LASTSEEN = 270             # Users who haven't used LOTW for 'n' days
+LOTW_RETRY = 3600               # Wait before retrying a failed download
+LOTW_TIMEOUT = 60
+CHUNK_SIZE = 1 << 16
+
+MAGIC = b'LOTW'
+VERSION = 1
+# magic, version, callsign width, users, bloom filter bytes, creation time
+HEADER = struct.Struct('<4sHHIIQ')
+DATE = struct.Struct('<I')      # date.toordinal() of the last upload
+BLOOM_BITS = 10                 # Bits per user, about 1% false positives
+BLOOM_HASHES = 7
+
+logger = logging.getLogger('ft8ctrl.lotw')
+
+
+def bloom_hashes(key, nbits):
+  digest = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+  hash1, hash2 = digest & 0xffffffff, (digest >> 32) | 1
+  return [(hash1 + idx * hash2) % nbits for idx in range(BLOOM_HASHES)]
+
+
+class _Calls:
+  # pylint: disable=too-few-public-methods
+  """Sequence of the callsigns of the index, for bisect"""
+  __slots__ = ['buffer', 'offset', 'width', 'size', 'count']
+
+  def __init__(self, buffer, offset, width, count):
+    self.buffer = buffer
+    self.offset = offset
+    self.width = width
+    self.size = width + DATE.size
+    self.count = count
+
+  def __len__(self):
+    return self.count
+
+  def __getitem__(self, idx):
+    start = self.offset + idx * self.size
+    return self.buffer[start:start + self.width]
+
+
+class LOTWIndex:
+  """Read only view of an index file"""
+
+  def __init__(self, path=LOTW_CACHE):
+    self.path = Path(path)
+    with open(self.path, 'rb') as fdi:
+      self.buffer = mmap.mmap(fdi.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+      magic, version, width, count, bloom_size, age = HEADER.unpack_from(self.buffer)
+      if magic != MAGIC or version != VERSION:
+        raise ValueError(f'{self.path} is not a LOTW index')
+      self.nbits = bloom_size * 8
+      self.calls = _Calls(self.buffer, HEADER.size + bloom_size, width, count)
+      if len(self.buffer) < HEADER.size + bloom_size + count * self.calls.size:
+        raise ValueError(f'{self.path} is truncated')
+    except (struct.error, ValueError):
+      self.buffer.close()
+      raise
+    self.age = age
+
+  @staticmethod
+  def write(path, users, age=None):
+    """Write the index of `users`, a dict of callsign: date ordinal. The
+    file is written under a temporary name then renamed, the processes
+    with the old file mapped keep using it."""
+    path = Path(path)
+    users = {(call if isinstance(call, bytes) else call.encode('ascii', 'replace')).upper(): seen
+             for call, seen in users.items()}
+    calls = sorted(users)
+    width = max((len(call) for call in calls), default=1)
+    bloom = bytearray(max(len(calls) * BLOOM_BITS, 64) // 8 + 1)
+    nbits = len(bloom) * 8
+    for call in calls:
+      for bit in bloom_hashes(call, nbits):
+        bloom[bit >> 3] |= 1 << (bit & 7)
+
+    fdn, tmpname = tempfile.mkstemp(prefix=path.name, dir=path.parent)
+    try:
+      with os.fdopen(fdn, 'wb') as fdi:
+        fdi.write(HEADER.pack(MAGIC, VERSION, width, len(calls), len(bloom),
+                              int(age or time.time())))
+        fdi.write(bloom)
+        for call in calls:
+          fdi.write(call.ljust(width, b'\0'))
+          fdi.write(DATE.pack(users[call]))
+      os.chmod(tmpname, 0o644)
+      os.replace(tmpname, path)
+    except OSError:
+      os.unlink(tmpname)
+      raise
+    logger.info('LOTW index %s: %d users', path, len(calls))
+
+  def lastseen(self, call):
+    """Date ordinal of the last upload of `call`, None if not a user"""
+    key = call.upper().encode('ascii', 'replace')
+    if len(key) > self.calls.width:
+      return None
+    buffer = self.buffer
+    for bit in bloom_hashes(key, self.nbits):
+      if not buffer[HEADER.size + (bit >> 3)] & 1 << (bit & 7):
+        return None
+    key = key.ljust(self.calls.width, b'\0')
+    idx = bisect_left(self.calls, key)
+    if idx == len(self.calls) or self.calls[idx] != key:
+      return None
+    start = self.calls.offset + idx * self.calls.size + self.calls.width
+    return DATE.unpack_from(self.buffer, start)[0]
+
+  def close(self):
+    self.buffer.close()
+
+  def __len__(self):
+    return len(self.calls)
+
+  def __repr__(self):
+    return f"<LOTWIndex> {self.path} users: {len(self)}"
+
+
+def read_activity(stream, chunk_size=CHUNK_SIZE):
+  """Users and date ordinal of their last upload from the ARRL activity
+  file, read by chunks. The lines are "CALL,YYYY-MM-DD,HH:MM:SS", the
+  dates are converted once and compared as integers."""
+  users = {}
+  ordinals = {}
+  tail = b''
+  while True:
+    chunk = stream.read(chunk_size)
+    lines = (tail + chunk).split(b'\n')
+    tail = lines.pop() if chunk else b''
+    for line in lines:
+      call, _, rest = line.partition(b',')
+      day = rest[:10]
+      if day not in ordinals:
+        try:
+          ordinals[day] = date.fromisoformat(day.decode('ascii')).toordinal()
+        except (ValueError, UnicodeDecodeError):
+          ordinals[day] = None
+      lastseen = ordinals[day]
+      if lastseen is None or not call:
+        continue
+      call = call.strip().upper()
+      if lastseen > users.get(call, 0):
+        users[call] = lastseen
+    if not chunk:
+      return users
+
+
+def refresh(url=LOTW_URL, path=LOTW_CACHE):
+  """Download the activity file and replace the index"""
+  context = ssl._create_unverified_context()  # pylint: disable=protected-access
+  with request.urlopen(url, context=context, timeout=LOTW_TIMEOUT) as response:
+    if getattr(response, 'status', None) not in (None, 200):
+      raise OSError(f'Download error {response.status}')
+    users = read_activity(response)
+  if not users:
+    raise ValueError(f'No LOTW users found in {url}')
+  LOTWIndex.write(path, users)
+  return len(users)
+
+
+class Refresh(Thread):
+  """Rebuild the index in the background and hand it to `lotw`"""
+
+  def __init__(self, lotw, url=LOTW_URL, path=LOTW_CACHE):
+    super().__init__(name='LOTWRefresh', daemon=True)
+    self.lotw = lotw
+    self.url = url
+    self.path = path
+
+  def run(self):
+    start = time.monotonic()
+    try:
+      count = refresh(self.url, self.path)
+      self.lotw.swap(LOTWIndex(self.path))
+    except (OSError, ValueError, struct.error) as err:
+      logger.error('LOTW refresh from %s: %s', self.url, err)
+      return
+    logger.info('LOTW refresh: %d users in %.1f seconds', count, time.monotonic() - start)
+
+
+class LOTW:
+  # Singleton class
+
+  def __new__(cls):
+    if hasattr(cls, '_instance') and isinstance(cls._instance, cls):
+      return cls._instance
+
+    cls.log = logging.getLogger(f'ft8ctrl.{cls.__name__}')
+    cls.log.info('LOTW database: %s (%d days)', LOTW_CACHE, LOTW_LASTSEEN)
+
+    if not LOTW_CACHE.parent.exists():
+      LOTW_CACHE.parent.mkdir(parents=True)
+
+    instance = super(LOTW, cls).__new__(cls)
+    instance.index = None
+    instance.expire = 0
+    instance.retry = 0
+    instance.refresher = None
+    try:
+      instance.swap(LOTWIndex(LOTW_CACHE))
+      cls.log.info('LOTW lookup database ready')
+    except (OSError, ValueError, struct.error) as err:
+      cls.log.warning('LOTW index: %s', err)
+    instance.check()
+    cls._instance = instance
+    return cls._instance
+
+  def swap(self, index):
+    """Use the new index, the lookups in progress finish with the old one"""
+    self.index = index
+    self.expire = index.age + LOTW_EXPIRE
+
+  def check(self):
+    """Start a background refresh when the index is missing or expired"""
+    now = time.time()
+    if now < self.expire or now < self.retry:
+      return
+    if self.refresher and self.refresher.is_alive():
+      return
+    self.log.info('LOTW cache expired. Reload...')
+    self.retry = now + LOTW_RETRY
+    self.refresher = Refresh(self)
+    self.refresher.start()
+
+  def lastseen(self, call):
+    """Date of the last upload of `call`, None if not a LOTW user"""
+    index = self.index
+    ordinal = index.lastseen(call) if index else None
+    return None if ordinal is None else date.fromordinal(ordinal)
+
+  def __contains__(self, call):
+    if time.time() > self.expire:
+      self.check()
+    index = self.index
+    if index is None:
+      return False
+    ordinal = index.lastseen(call)
+    return ordinal is not None and ordinal > date.today().toordinal() - LOTW_LASTSEEN
+
+  def __repr__(self):
+    expire = int(self.expire - time.time())
+    if expire < 1:
+      return f'<LOTW id:{id(self)}> LOTW cache "Expired"'
+    return f"<LOTW id:{id(self)}> LOTW cache expire in: {expire} seconds"
+
+
+def main():
+  parser = ArgumentParser(description="LOTW users lookups")
+  parser.add_argument("--refresh", action="store_true", default=False,
+                      help="Download the LOTW activity file and rebuild the index")
+  parser.add_argument("--url", default=LOTW_URL,
+                      help="LOTW activity file URL [default: %(default)s]")
+  parser.add_argument("calls", nargs='*', help="Callsigns to look up")
+  opts = parser.parse_args()
+  logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s - %(message)s')
+
+  try:
+    if opts.refresh:
+      refresh(opts.url)
+    index = LOTWIndex(LOTW_CACHE)
+  except (OSError, ValueError, struct.error) as err:
+    print(f"Error: {err}", file=sys.stderr)
+    raise SystemExit('LOTW index error') from None
+
+  print(index)
+  cutoff = date.today().toordinal() - LOTW_LASTSEEN
+  for call in opts.calls:
+    ordinal = index.lastseen(call)
+    if ordinal is None:
+      print(f"{call.upper()}: not a LOTW user")
+    else:
+      status = '' if ordinal > cutoff else f' (more than {LOTW_LASTSEEN} days)'
+      print(f"{call.upper()}: {date.fromordinal(ordinal)}{status}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,143 @@
+#
+# BSD 3-Clause License
+#
+# Copyright (c) 2023, Fred W6BSD
+# All rights reserved.
+#
+"""
+Tokenizer for the FT8/FT4 standard messages.
+
+The message is split once and classified from its first and last
+tokens, no regular expression is involved.
+
+  CQ W6BSD CM87          -> CQ      call, grid
+  CQ W6BSD               -> CQ      call
+  CQ DX W6BSD CM87       -> DXCQ    extra, call, grid
+  K1ABC W6BSD CM87       -> REPLY   to, call, grid
+  K1ABC W6BSD -12        -> REPORT  to, call, report
+  K1ABC W6BSD R-12       -> REPORT  to, call, report
+  K1ABC W6BSD RR73       -> RR73    to, call  (also RRR)
+  K1ABC W6BSD 73         -> 73      to, call
+  K1ABC W6BSD R 2A WI    -> REPLY   to, call  (contest exchanges)
+"""
+
+from enum import Enum
+
+
+class MessageType(Enum):
+  CQ = 'CQ'
+  DXCQ = 'DXCQ'
+  REPLY = 'REPLY'
+  REPORT = 'REPORT'
+  RR73 = 'RR73'
+  SEVENTY_THREE = '73'
+
+
+CQ = MessageType.CQ
+DXCQ = MessageType.DXCQ
+REPLY = MessageType.REPLY
+REPORT = MessageType.REPORT
+
+# Messages sent to a station (to, call), as opposed to the CQ calls
+DIRECTED = frozenset([MessageType.REPLY, MessageType.REPORT, MessageType.RR73,
+                      MessageType.SEVENTY_THREE])
+
+# Last token of the directed messages, the reports are -50 to +49 with
+# an optional R. The grids are checked separately.
+LAST_TOKEN = {
+  'RR73': MessageType.RR73,
+  'RRR': MessageType.RR73,
+  '73': MessageType.SEVENTY_THREE,
+}
+LAST_TOKEN.update({f'{r}{snr:+03d}': REPORT for r in ('', 'R') for snr in range(-50, 50)})
+
+FIELD_LETTERS = frozenset('ABCDEFGHIJKLMNOPQR')
+
+
+class Message:
+  """Result of the parser. `call` is the callsign as transmitted, with
+  its portable suffix, `suffix` is the suffix alone."""
+  # pylint: disable=too-few-public-methods,too-many-arguments,too-many-positional-arguments
+  __slots__ = ('kind', 'call', 'suffix', 'to', 'grid', 'extra', 'report')
+
+  def __init__(self, kind, call, suffix=None, to=None, grid=None, extra=None, report=None):
+    self.kind = kind
+    self.call = call
+    self.suffix = suffix
+    self.to = to
+    self.grid = grid
+    self.extra = extra
+    self.report = report
+
+  @property
+  def directed(self):
+    return self.kind in DIRECTED
+
+  def __repr__(self):
+    fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__[1:]
+                       if getattr(self, name) is not None)
+    return f'<Message {self.kind.value} {fields}>'
+
+
+def compound_call(token):
+  """Return (callsign, suffix) or (None, None) if the token isn't a
+  callsign. Hashed callsigns are sent between angle brackets."""
+  if token[0] == '<' and token[-1] == '>':
+    token = token[1:-1]
+  base, _, suffix = token.partition('/')
+  if not base.isalnum() or base.isalpha() or (suffix and not suffix.isalnum()):
+    return None, None
+  return token, suffix or None
+
+
+def parse(message):
+  """Classify a decoded message, return a Message object or None"""
+  # pylint: disable=too-many-return-statements,too-many-branches
+  tokens = message.split()
+  ntok = len(tokens)
+  if ntok < 2:
+    return None
+
+  # A callsign is made of letters and at least one digit. The plain
+  # callsigns are checked inline, compound_call() handles the others.
+  if tokens[0] == 'CQ':
+    # CQ CALL [GRID] | CQ EXTRA CALL GRID
+    if ntok > 4:
+      return None
+    extra = tokens[1] if ntok == 4 else None
+    call = tokens[ntok - 2] if ntok > 2 else tokens[1]
+    grid = tokens[ntok - 1] if ntok > 2 else None
+    if grid and not (len(grid) == 4 and grid[2:].isdigit() and grid[0] in FIELD_LETTERS
+                     and grid[1] in FIELD_LETTERS):
+      return None
+    suffix = None
+    if not call.isalnum() or call.isalpha():
+      call, suffix = compound_call(call)
+      if not call:
+        return None
+    if extra is None or extra == 'CQ':
+      return Message(CQ, call, suffix, None, grid, None, None)
+    return Message(DXCQ, call, suffix, None, grid, extra, None)
+
+  # TO CALL [GRID|REPORT|R-REPORT|RR73|RRR|73|EXCHANGE...]
+  to, call = tokens[0], tokens[1]
+  if not to.isalnum() or to.isalpha():
+    to, _ = compound_call(to)
+    if not to:
+      return None
+  suffix = None
+  if not call.isalnum() or call.isalpha():
+    call, suffix = compound_call(call)
+    if not call:
+      return None
+  if ntok != 3:
+    return Message(REPLY, call, suffix, to, None, None, None)
+  last = tokens[2]
+  if (kind := LAST_TOKEN.get(last)) is REPORT:
+    return Message(REPORT, call, suffix, to, None, None, last)
+  if kind:
+    return Message(kind, call, suffix, to, None, None, None)
+  if (len(last) == 4 and last[2:].isdigit() and last[0] in FIELD_LETTERS
+      and last[1] in FIELD_LETTERS):
+    return Message(REPLY, call, suffix, to, last, None, None)
+  return Message(REPLY, call, suffix, to, None, None, None)
@@ -0,0 +1,77 @@
+#
+# BSD 3-Clause License
+#
+# Copyright (c) 2023, Fred W6BSD
+# All rights reserved.
+#
+"""
+Lightweight statistics to keep an eye on the hot paths.
+"""
+
+import logging
+import threading
+from collections import Counter
+
+logger = logging.getLogger('ft8ctrl.metrics')
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class Stats:
+  # pylint: disable=too-many-instance-attributes
+  """Count, mean, min, max and last value observed for one measure.
+  The histogram buckets are powers of 2."""
+
+  def __init__(self, name):
+    self.name = name
+    self._lock = threading.Lock()
+    self.count = 0
+    self.total = 0
+    self.min = None
+    self.max = None
+    self.last = None
+    self.histogram = Counter()
+
+  def add(self, value):
+    with self._lock:
+      self.count += 1
+      self.total += value
+      self.last = value
+      self.min = value if self.min is None else min(self.min, value)
+      self.max = value if self.max is None else max(self.max, value)
+      self.histogram[1 << max(0, int(value) - 1).bit_length()] += 1
+
+  @property
+  def mean(self):
+    return self.total / self.count if self.count else 0
+
+  def as_dict(self):
+    with self._lock:
+      return {'count': self.count, 'mean': self.mean, 'min': self.min, 'max': self.max,
+              'last': self.last, 'histogram': dict(sorted(self.histogram.items()))}
+
+  def __repr__(self):
+    return (f"<Stats {self.name}> count: {self.count}, mean: {self.mean:.2f}, "
+            f"min: {self.min}, max: {self.max}")
+
+
+def get_stats(name):
+  """Return the Stats object registered under `name`, create it if needed"""
+  with _registry_lock:
+    if name not in _registry:
+      _registry[name] = Stats(name)
+    return _registry[name]
+
+
+def snapshot():
+  with _registry_lock:
+    stats = list(_registry.values())
+  return {st.name: st.as_dict() for st in stats}
+
+
+def log_report(level=logging.DEBUG):
+  with _registry_lock:
+    stats = sorted(_registry.values(), key=lambda s: s.name)
+  for stat in stats:
+    logger.log(level, '%r', stat)
@@ -10,8 +10,5 @@ from .base import CallSelector
 
 class Any(CallSelector):
 
-  def get(self, band):
-    records = []
-    for record in super().get(band):
-      records.append(record)
-    return self.select_record(records)
+  def get(self, snapshot):
+    return self.select_record(super().get(snapshot), snapshot)
@@ -19,9 +19,9 @@ class CallSign(CallSelector):
     self.call_list = getattr(self.config, 'list', [])
     self.reverse = getattr(self.config, 'reverse', False)
 
-  def get(self, band):
+  def get(self, snapshot):
     records = []
-    for record in super().get(band):
+    for record in super().get(snapshot):
       if bool(record['call'] in self.call_list) ^ self.reverse:
         self.log.warning('Select call %s from list', record['call'])
         records.append(record)
@@ -29,4 +29,4 @@ class CallSign(CallSelector):
         self.log.warning('Select call %s from regexp', record['call'])
         records.append(record)
 
-    return self.select_record(records)
+    return self.select_record(records, snapshot)
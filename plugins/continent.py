@@ -5,9 +5,10 @@
 # All rights reserved.
 #
 
-from DXEntity import DXCC
+from dxcc import Resolver
 
 from .base import CallSelector
+from .predicates import Member
 
 
 class Continent(CallSelector):
@@ -26,20 +27,17 @@ class Continent(CallSelector):
         self.c_list.add(cnt)
       else:
         self.log.warning('Ignoring continent: "%s" is not valid', cnt)
+    self.predicates.append(Member('continent', self.c_list, self.reverse))
 
-  def get(self, band):
-    records = []
-    for record in super().get(band):
-      if (record['continent'] in self.c_list) ^ self.reverse:
-        records.append(record)
-    return self.select_record(records)
+  def get(self, snapshot):
+    return self.select_record(super().get(snapshot), snapshot)
 
 
 class Country(CallSelector):
 
   def __init__(self):
     super().__init__()
-    dxcc = DXCC()
+    dxcc = Resolver()
     self.c_list = set([])
     self.reverse = getattr(self.config, 'reverse', False)
     entities = getattr(self.config, 'list', [])
@@ -50,10 +48,7 @@ class Country(CallSelector):
         self.c_list.add(country)
       else:
         self.log.warning('Ignoring country: "%s" is not a valid entity', country)
+    self.predicates.append(Member('country', self.c_list, self.reverse))
 
-  def get(self, band):
-    records = []
-    for record in super().get(band):
-      if (record['country'] in self.c_list) ^ self.reverse:
-        records.append(record)
-    return self.select_record(records)
+  def get(self, snapshot):
+    return self.select_record(super().get(snapshot), snapshot)
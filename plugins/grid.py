@@ -6,24 +6,16 @@
 #
 #
 
-import re
-
 from .base import CallSelector
+from .predicates import Match
 
 
 class Grid(CallSelector):
 
   def __init__(self):
     super().__init__()
-    self.expr = re.compile(self.config.regexp)
     self.reverse = getattr(self.config, 'reverse', False)
+    self.predicates.append(Match('grid', self.config.regexp, self.reverse))
 
-  def get(self, band):
-    records = []
-    for record in super().get(band):
-      try:
-        if bool(self.expr.search(record['grid'])) ^ self.reverse:
-          records.append(record)
-      except TypeError:
-        self.log.warning('Unable to determine the grid: %s', record['packet']['Message'])
-    return self.select_record(records)
+  def get(self, snapshot):
+    return self.select_record(super().get(snapshot), snapshot)
@@ -0,0 +1,80 @@
+#
+# BSD 3-Clause License
+#
+# Copyright (c) 2023, Fred W6BSD
+# All rights reserved.
+#
+"""
+Declarative filters of the call selectors. Each selector lists its
+predicates, they are compiled into a list comprehension run on the
+records of the Snapshot, without a function call per record. The values
+are passed to the comprehension as names, only the field names are
+written in the source.
+"""
+
+import re
+
+
+class Member:
+  """The field value is in `values`, or not if `reverse`"""
+  __slots__ = ['field', 'values', 'reverse']
+
+  def __init__(self, field, values, reverse=False):
+    self.field = field
+    self.values = frozenset(values)
+    self.reverse = bool(reverse)
+
+  def expr(self, name):
+    operator = 'not in' if self.reverse else 'in'
+    return f"record[{self.field!r}] {operator} {name}", {name: self.values}
+
+  def __repr__(self):
+    return f"<Member> {self.field} {'not ' if self.reverse else ''}in {sorted(self.values)}"
+
+
+class Range:
+  """low < field value < high"""
+  __slots__ = ['field', 'low', 'high']
+
+  def __init__(self, field, low, high):
+    self.field = field
+    self.low = low
+    self.high = high
+
+  def expr(self, name):
+    return (f"{name}_low < record[{self.field!r}] < {name}_high",
+            {f"{name}_low": self.low, f"{name}_high": self.high})
+
+  def __repr__(self):
+    return f"<Range> {self.low} < {self.field} < {self.high}"
+
+
+class Match:
+  """The regular expression matches the field value, or doesn't match if
+  `reverse`. Never true when the field is empty."""
+  __slots__ = ['field', 'regexp', 'reverse']
+
+  def __init__(self, field, regexp, reverse=False):
+    self.field = field
+    self.regexp = re.compile(regexp)
+    self.reverse = bool(reverse)
+
+  def expr(self, name):
+    value = f"record[{self.field!r}]"
+    operator = 'is' if self.reverse else 'is not'
+    return f"{value} is not None and {name}({value}) {operator} None", {name: self.regexp.search}
+
+  def __repr__(self):
+    return f"<Match> {self.field} {'!~' if self.reverse else '~'} {self.regexp.pattern}"
+
+
+def compile_predicates(predicates):
+  """Return a function returning the records matching all the predicates"""
+  tests = []
+  namespace = {}
+  for idx, predicate in enumerate(predicates):
+    test, names = predicate.expr(f'_p{idx}')
+    tests.append(f"({test})")
+    namespace.update(names)
+  source = f"lambda records: [record for record in records if {' and '.join(tests) or 'True'}]"
+  return eval(source, namespace)  # pylint: disable=eval-used
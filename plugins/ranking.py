@@ -0,0 +1,122 @@
+#
+# BSD 3-Clause License
+#
+# Copyright (c) 2023, Fred W6BSD
+# All rights reserved.
+#
+"""
+Order of the candidates of a call selector. The "rank" option of the
+selector is the name of a ranking function, or the weight of several of
+them: `rank: {snr: 1, rarity: 2}`. With more than one function, the
+scores are scaled between 0 and 1 before they are added.
+
+Only the TOP_K best candidates are taken first, with a heap, or with
+numpy above VECTOR_SIZE candidates when it is installed. The others are
+sorted only if none of the TOP_K is accepted.
+"""
+
+import heapq
+import logging
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+VECTOR_SIZE = 256
+TOP_K = 16                      # Candidates ranked before the others
+DEFAULT_RANK = 'snr'
+
+logger = logging.getLogger('ft8ctrl.ranking')
+
+
+def snr(records, _snapshot):
+  return [record['snr'] for record in records]
+
+
+def coefficient(records, _snapshot):
+  return [record['coef'] for record in records]
+
+
+def distance(records, _snapshot):
+  return [record['distance'] for record in records]
+
+
+def rarity(records, snapshot):
+  """The less the country has been worked on the band, the rarer"""
+  worked = snapshot.worked
+  return [1 / (1 + worked[record['country']]) for record in records]
+
+
+RANKINGS = {
+  'snr': snr,
+  'coef': coefficient,
+  'distance': distance,
+  'rarity': rarity,
+}
+
+
+def scale(scores):
+  low, high = min(scores), max(scores)
+  if low == high:
+    return [0.0] * len(scores)
+  return [(score - low) / (high - low) for score in scores]
+
+
+class Ranking:
+  """Score the records with one, or a weighted mix of, RANKINGS"""
+
+  def __init__(self, rank=DEFAULT_RANK):
+    if isinstance(rank, str):
+      rank = {rank: 1}
+    self.weights = {}
+    for name, weight in (rank or {}).items():
+      if name in RANKINGS:
+        self.weights[name] = float(weight)
+      else:
+        logger.warning('Ignoring rank: "%s" is not one of %s', name, ', '.join(RANKINGS))
+    if not self.weights:
+      self.weights = {DEFAULT_RANK: 1.0}
+
+  def scores(self, records, snapshot):
+    if len(self.weights) == 1:
+      (name, weight), = self.weights.items()
+      scores = RANKINGS[name](records, snapshot)
+      return scores if weight == 1 else [score * weight for score in scores]
+    total = [0.0] * len(records)
+    for name, weight in self.weights.items():
+      scores = scale(RANKINGS[name](records, snapshot))
+      total = [tot + score * weight for tot, score in zip(total, scores)]
+    return total
+
+  def vector_scores(self, records, snapshot):
+    total = numpy.zeros(len(records))
+    for name, weight in self.weights.items():
+      scores = numpy.fromiter(RANKINGS[name](records, snapshot), float, len(records))
+      if len(self.weights) > 1:
+        low, high = scores.min(), scores.max()
+        scores = (scores - low) / (high - low) if high > low else numpy.zeros(len(records))
+      total += scores * weight
+    return total
+
+  def best(self, records, snapshot):
+    """Yield the records, the highest score first. Equal scores keep the
+    order of `records`."""
+    if not records:
+      return
+    if numpy is not None and len(records) >= VECTOR_SIZE:
+      scores = -self.vector_scores(records, snapshot)
+      kth = numpy.partition(scores, TOP_K - 1)[TOP_K - 1]
+      for selected in (numpy.flatnonzero(scores <= kth), numpy.flatnonzero(scores > kth)):
+        for idx in selected[numpy.argsort(scores[selected], kind='stable')]:
+          yield records[idx]
+      return
+    scores = self.scores(records, snapshot)
+    top = heapq.nlargest(TOP_K, range(len(records)), key=scores.__getitem__)
+    yield from (records[idx] for idx in top)
+    if len(records) > TOP_K:
+      rest = sorted(range(len(records)), key=scores.__getitem__, reverse=True)[TOP_K:]
+      yield from (records[idx] for idx in rest)
+
+  def __repr__(self):
+    return '<Ranking> ' + ', '.join(f'{name}: {weight}' for name, weight in self.weights.items())
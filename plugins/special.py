@@ -5,34 +5,29 @@
 # All rights reserved.
 #
 
-from dbutils import connect_db
-
 from .base import CallSelector
+from .predicates import Member
 
 
 class DXCC100(CallSelector):
 
-  WORKED = ("SELECT country FROM cqcalls WHERE status = 2 and band = ? "
-            "GROUP BY country HAVING count(*) >= ?")
-
   def __init__(self):
     super().__init__()
     self.worked_count = getattr(self.config, "worked_count", 2)
 
-  def get(self, band):
+  def get(self, snapshot):
     records = []
-    with connect_db(self.db_name) as conn:
-      curs = conn.cursor()
-      result = curs.execute(self.WORKED, (band, self.worked_count,))
-      worked = set(r['country'] for r in result)
+    worked = set(country for country, count in snapshot.worked.items()
+                 if count >= self.worked_count)
 
-    for record in super().get(band):
-      # self.log.debug("%s %s %s (%s)", record['call'], record['country'], record['snr'], band)
+    for record in super().get(snapshot):
+      # self.log.debug("%s %s %s (%s)", record['call'], record['country'], record['snr'],
+      #                snapshot.band)
       if record['country'] not in worked:
         self.log.debug('Selected: %s', record['call'])
         records.append(record)
 
-    return self.select_record(records)
+    return self.select_record(records, snapshot)
 
 
 class Extra(CallSelector):
@@ -41,10 +36,7 @@ class Extra(CallSelector):
     super().__init__()
     self.reverse = getattr(self.config, 'reverse', False)
     self.ex_list = set(getattr(self.config, 'list', []))
+    self.predicates.append(Member('extra', self.ex_list, self.reverse))
 
-  def get(self, band):
-    records = []
-    for record in super().get(band):
-      if (record['extra'] in self.ex_list) ^ self.reverse:
-        records.append(record)
-    return self.select_record(records)
+  def get(self, snapshot):
+    return self.select_record(super().get(snapshot), snapshot)
@@ -6,9 +6,12 @@
 #
 
 from .base import CallSelector
+from .predicates import Member
 
 
 class ZoneSelector(CallSelector):
+  FIELD = None
+
   def __init__(self):
     super().__init__()
     self.reverse = getattr(self.config, 'reverse', False)
@@ -19,25 +22,19 @@ class ZoneSelector(CallSelector):
     # Make sure zones are integers. Ignore the non integer values.
     for zone in zones_list:
       try:
-        self.z_list.add(str(int(zone)))
+        self.z_list.add(int(zone))
       except ValueError:
         self.log.warning('%s "%s" is not a integer', self.__class__.__name__, zone)
 
-  def z_get(self, band, field):
-    records = []
-    for record in self.get(band):
-      if (record[field] in self.z_list) ^ self.reverse:
-        records.append(record)
-    return self.select_record(records)
+    self.predicates.append(Member(self.FIELD, self.z_list, self.reverse))
 
+  def get(self, snapshot):
+    return self.select_record(super().get(snapshot), snapshot)
 
-class CQZone(ZoneSelector):
 
-  def get(self, band):
-    return super().z_get(band, 'cqzone')
+class CQZone(ZoneSelector):
+  FIELD = 'cqzone'
 
 
 class ITUZone(ZoneSelector):
-
-  def get(self, band):
-    return super().z_get(band, 'ituzone')
+  FIELD = 'ituzone'
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+#
+# BSD 3-Clause License
+#
+# Copyright (c) 2023, Fred W6BSD
+# All rights reserved.
+#
+"""
+Send the datagrams of a capture file (ft8ctrl.py --capture) to a
+running ft8ctrl, the same way WSJT-X would.
+"""
+
+import socket
+import sys
+import time
+from argparse import ArgumentParser
+
+from capture import read_capture, retime
+
+
+def replay(filename, address, speed=1.0, keep_time=False):
+  """Replay the capture file. `speed` 0 means as fast as possible"""
+  # pylint: disable=too-many-locals
+  sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+  sock.setblocking(False)
+  count = size = replies = 0
+  first = start = shift = None
+  for arrival, data in read_capture(filename):
+    if first is None:
+      first, start = arrival, time.time()
+      shift = 0 if keep_time else (start - first) * 1000
+    if speed:
+      delay = (arrival - first) / speed - (time.time() - start)
+      if delay > 0:
+        time.sleep(delay)
+    sock.sendto(retime(data, shift) if shift else data, address)
+    count += 1
+    size += len(data)
+    replies += drain(sock)
+
+  elapsed = time.time() - start if start else 0
+  replies += drain(sock)
+  sock.close()
+  return count, size, replies, elapsed
+
+
+def drain(sock):
+  """Read the Reply and HaltTx packets sent back by ft8ctrl"""
+  count = 0
+  while True:
+    try:
+      sock.recv(1 << 16)
+    except (BlockingIOError, ConnectionRefusedError):
+      return count
+    count += 1
+
+
+def main():
+  parser = ArgumentParser(description="Replay a WSJT-X capture file")
+  parser.add_argument("capture", help="Capture file name")
+  parser.add_argument("-a", "--address", default="127.0.0.1",
+                      help="ft8ctrl address [default: %(default)s]")
+  parser.add_argument("-p", "--port", type=int, default=2238,
+                      help="ft8ctrl port [default: %(default)s]")
+  pacing = parser.add_mutually_exclusive_group()
+  pacing.add_argument("-s", "--speed", type=float, default=1.0,
+                      help="Replay speed, 2 is twice as fast [default: %(default)s]")
+  pacing.add_argument("-f", "--fast", action="store_true", default=False,
+                      help="Replay as fast as possible")
+  parser.add_argument("-k", "--keep-time", action="store_true", default=False,
+                      help="Don't move the decode times to the current time")
+  opts = parser.parse_args()
+
+  speed = 0 if opts.fast else opts.speed
+  try:
+    count, size, replies, elapsed = replay(opts.capture, (opts.address, opts.port), speed,
+                                           opts.keep_time)
+  except IOError as err:
+    print(f"Error: {err}", file=sys.stderr)
+    raise SystemExit('Replay Error') from None
+
+  rate = count / elapsed if elapsed else 0
+  print(f"Packets: {count}, Bytes: {size}, Replies: {replies}, "
+        f"Time: {elapsed:.3f}s, Rate: {rate:.0f} packets/s")
+
+
+if __name__ == "__main__":
+  try:
+    main()
+  except KeyboardInterrupt:
+    raise SystemExit('^C pressed') from None
@@ -17,11 +17,15 @@
 # ******************************************************************
 #
 # pylint: disable=consider-using-f-string,too-few-public-methods,too-many-public-methods
+#
+# The packet layouts are described once, in the SCHEMA of each class.
+# The decode and encode functions are generated from the schema when
+# the module is imported.
 
-import ctypes
 import struct
 from datetime import datetime, timedelta
 from enum import Enum
+from functools import lru_cache
 
 WS_MAGIC = 0xADBCCBDA
 WS_SCHEMA = 2
@@ -83,375 +87,403 @@ class SOMode(Enum):
 
 
 SHEAD = struct.Struct('!III')
+SBYTE = struct.Struct('!B')
+SBOOL = struct.Struct('!?')
+SINT32 = struct.Struct('!i')
+SUINT16 = struct.Struct('!H')
+SUINT32 = struct.Struct('!I')
+SLONGLONG = struct.Struct('!Q')
+SDOUBLE = struct.Struct('!d')
+SDATETIME = struct.Struct('!QIB')
+SCOLOR = struct.Struct('!HHHH')
 JULIAN_ORIGIN = 2451545         # Julian date for 2000/01/01
 
+# Fixed width field types, consecutive fixed width fields are decoded
+# and encoded together with a single compiled struct.
+FIXED_TYPES = {
+  'bool': '?',
+  'byte': 'B',
+  'uint16': 'H',
+  'int32': 'i',
+  'uint32': 'I',
+  'longlong': 'Q',
+  'double': 'd',
+}
+
+# Value of the fields an older WSJT-X doesn't send.
+ZERO_VALUES = {
+  'bool': False,
+  'byte': 0,
+  'uint16': 0,
+  'int32': 0,
+  'uint32': 0,
+  'longlong': 0,
+  'double': 0.0,
+  'string': '',
+  'datetime': (0, 0, 0, 0),
+  'color': (0, 0, 0),
+}
+
+ZERO = object()
 
-class _WSPacket:
 
-  def __init__(self, pkt=None):
-    self._data = {}
-    self._index = 0            # Keeps track of where we are in the packet parsing!
+def from_julian(jday, msec, *_):
+  # this function doesn't work with dates prior to 2000
+  epoch = datetime(2000, 1, 1)
+  tdelta = timedelta(days=jday - JULIAN_ORIGIN)
+  day = epoch + tdelta
+  dtime = day + timedelta(microseconds=msec * 1000)
+  return dtime
 
-    if pkt is None:
-      self._packet = ctypes.create_string_buffer(1023)
-      self._magic_number = WS_MAGIC
-      self._schema_version = WS_SCHEMA
-      self._packet_type = 0
-      self._client_id = WS_CLIENTID
-    else:
-      self._packet = ctypes.create_string_buffer(pkt, 1023)
-      self._decode()
 
-  def raw(self):
-    try:
-      self._encode()
-    except struct.error as err:
-      raise IOError(err) from None
-    return self._packet[:self._index]
-
-  def _decode(self):
-    # in here depending on the Packet Type we create the class to handle the packet!
-    magic, schema, pkt_type = SHEAD.unpack_from(self._packet)
-    self._index += SHEAD.size
-    self._magic_number = magic
-    self._schema_version = schema
-    self._packet_type = pkt_type
-    self._client_id = self._get_string()
-
-  def _encode(self):
-    self._index = 0
-    SHEAD.pack_into(self._packet, 0, self._magic_number,
-                    self._schema_version, self._packet_type.value)
-    self._index += SHEAD.size
-    self._set_string(self._client_id)
+def to_julian(dtime):
+  # this function doesn't work with dates prior to 2000
+  epoch = datetime(2000, 1, 1)
+  delta = dtime - epoch
+  jday = delta.days + JULIAN_ORIGIN
+  milliseconds = int(delta.seconds * 1000)
+  return (jday, milliseconds, 1, 0)
 
-  def __repr__(self):
-    sbuf = [str(self.__class__)]
-    for key, val in sorted(self._data.items()):
-      sbuf.append("{}:{}".format(key, val))
-    return ', '.join(sbuf)
 
-  def _get_string(self):
-    length = self._get_int32()
-    # Empty strings have a length of zero whereas null strings have a
-    # length field of 0xffffffff.
-    if length == -1:
-      return None
-    fmt = '!{:d}s'.format(length)
-    string, *_ = struct.unpack_from(fmt, self._packet, self._index)
-    self._index += length
-    return string.decode('utf-8')
-
-  def _set_string(self, string):
-    if string is None:
-      self._set_int32(-1)
-      return
+def wstime2datetime(qtm):
+  """wsjtx time containd the number of milliseconds since midnight"""
+  tday_midnight = datetime.combine(datetime.utcnow(), datetime.min.time())
+  return tday_midnight + timedelta(milliseconds=qtm)
 
-    fmt = ''
-    string = string.encode('utf-8')
-    length = len(string)
-    fmt = '!i{:d}s'.format(length)
-    struct.pack_into(fmt, self._packet, self._index, length, string)
-    self._index += struct.calcsize(fmt)
 
-  def _get_datetime(self):
-    time_offset = 0
-    date_off = self._get_longlong()
-    time_off = self._get_uint32()
-    time_spec = self._get_byte()
-    if time_spec == 2:
-      time_offset = self._get_int32()
-    return (date_off, time_off, time_spec, time_offset)
+def datetime2wstime(dtime):
+  """wsjtx time containd the number of milliseconds since midnight"""
+  tday_midnight = datetime.combine(datetime.utcnow(), datetime.min.time())
+  return int((dtime - tday_midnight).total_seconds() * 1000)
 
-  def _set_datetime(self, value):
-    date_off, time_off, time_spec, time_offset = value
-    self._set_longlong(date_off)
-    self._set_uint32(time_off)
-    self._set_byte(time_spec)
-    if time_spec == 2:
-      self._set_uint32(time_offset)
 
-  def _get_data(self, fmt):
-    data, *_ = struct.unpack_from(fmt, self._packet, self._index)
-    self._index += struct.calcsize(fmt)
-    return data
+def read_string(buf, offset):
+  length, = SINT32.unpack_from(buf, offset)
+  offset += SINT32.size
+  # Empty strings have a length of zero whereas null strings have a
+  # length field of 0xffffffff.
+  if length == -1:
+    return None, offset
+  end = offset + length
+  if end > len(buf):
+    raise struct.error('unpack requires a buffer of {:d} bytes'.format(end))
+  return str(buf[offset:end], 'utf-8'), end
 
-  def _set_data(self, fmt, value):
-    struct.pack_into(fmt, self._packet, self._index, value)
-    self._index += struct.calcsize(fmt)
 
-  def _get_byte(self):
-    return self._get_data('!B')
+def read_datetime(buf, offset):
+  date_off, time_off, time_spec = SDATETIME.unpack_from(buf, offset)
+  offset += SDATETIME.size
+  time_offset = 0
+  if time_spec == 2:
+    time_offset, = SINT32.unpack_from(buf, offset)
+    offset += SINT32.size
+  return (date_off, time_off, time_spec, time_offset), offset
 
-  def _set_byte(self, value):
-    self._set_data('!B', value)
 
-  def _get_bool(self):
-    return self._get_data('!?')
+def read_color(buf, offset):
+  _, red, green, blue = SCOLOR.unpack_from(buf, offset)
+  return (red, green, blue), offset + SCOLOR.size
 
-  def _set_bool(self, value):
-    assert isinstance(value, (bool, int)), "Value should be bool or int"
-    self._set_data('!?', value)
 
-  def _get_int32(self):
-    return self._get_data('!i')
+def encode_string(string):
+  if string is None:
+    return SINT32.pack(-1)
+  string = string.encode('utf-8')
+  return SINT32.pack(len(string)) + string
 
-  def _set_int32(self, value):
-    self._set_data('!i', value)
 
-  def _get_uint16(self):
-    return self._get_data('!H')
+def encode_datetime(value):
+  date_off, time_off, time_spec, time_offset = value
+  data = SDATETIME.pack(date_off, time_off, time_spec)
+  if time_spec == 2:
+    data += SUINT32.pack(time_offset)
+  return data
 
-  def _set_uint16(self, value):
-    assert isinstance(value, int)
-    self._set_data('!H', value)
 
-  def _get_uint32(self):
-    return self._get_data('!I')
+def encode_color(rgb):
+  return SCOLOR.pack(0xffff, *rgb)
 
-  def _set_uint32(self, value):
-    assert isinstance(value, int)
-    self._set_data('!I', value)
 
-  def _get_longlong(self):
-    return self._get_data('!Q')
+@lru_cache(maxsize=16)
+def encode_header(pkt_type, client_id=WS_CLIENTID, schema=WS_SCHEMA):
+  """Header and client id are the same for every packet of a given type"""
+  return SHEAD.pack(WS_MAGIC, schema, pkt_type.value) + encode_string(client_id)
 
-  def _set_longlong(self, value):
-    assert isinstance(value, int)
-    self._set_data('!Q', value)
 
-  def _get_double(self):
-    return self._get_data('!d')
+READERS = {'string': read_string, 'datetime': read_datetime, 'color': read_color}
+WRITERS = {'string': encode_string, 'datetime': encode_datetime, 'color': encode_color}
 
-  def _set_double(self, value):
-    assert isinstance(value, float)
-    self._set_data('!d', value)
 
+class Field:
+  """One field of a packet schema. `decode` and `encode` convert between
+  the value on the wire and the value stored in the packet object."""
+  __slots__ = ('name', 'ftype', 'default', 'decode', 'encode')
 
-class WSHeartbeat(_WSPacket):
-  """Packet Type 0 Heartbeat (In/Out)"""
-  def __init__(self, pkt=None):
-    super().__init__(pkt)
-    self._packet_type = PacketType.HEARTBEAT
+  def __init__(self, name, ftype, default=ZERO, decode=None, encode=None):
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    if ftype not in ZERO_VALUES:
+      raise ValueError('Unknown field type: {}'.format(ftype))
+    self.name = name
+    self.ftype = ftype
+    self.default = ZERO_VALUES[ftype] if default is ZERO else default
+    self.decode = decode
+    self.encode = encode
 
   def __repr__(self):
-    return "{} - Schema: {} Version: {} Revision: {}".format(
-      self.__class__, self.MaxSchema, self.Version, self.Revision)
-
-  def _decode(self):
-    super()._decode()
-    self._data['MaxSchema'] = self._get_uint32()
-    self._data['Version'] = self._get_string()
-    self._data['Revision'] = self._get_string()
+    return "<Field {}:{}>".format(self.name, self.ftype)
+
+
+def slots(schema):
+  return tuple('_' + field.name for field in schema)
+
+
+def compile_layout(schema):
+  """Turn the schema into segments (ftype, fields, struct).
+  Runs of fixed width fields are merged into one 'run' segment."""
+  layout = []
+  run = []
+
+  def close_run():
+    if run:
+      fmt = struct.Struct('!' + ''.join(FIXED_TYPES[field.ftype] for field in run))
+      layout.append(('run', tuple(run), fmt))
+      run.clear()
+
+  for field in schema:
+    if field.ftype in FIXED_TYPES:
+      run.append(field)
+      continue
+    close_run()
+    layout.append((field.ftype, (field,), None))
+  close_run()
+  return tuple(layout)
+
+
+def _compile(source, name, env):
+  # Same technique as collections.namedtuple and dataclasses.
+  exec(source, env)  # pylint: disable=exec-used
+  return env[name]
+
+
+def _segment_lines(idx, segment, env):
+  """Source code decoding one segment, `offset` points after the segment"""
+  ftype, fields, fmt = segment
+  if fmt:
+    env['s{}'.format(idx)] = fmt
+    names = ''.join('v_{}, '.format(field.name) for field in fields)
+    # A packet from an older WSJT-X can stop in the middle of a run, the
+    # missing fields read as zero.
+    lines = ['if size - offset < s{0}.size:',
+             '  {1}= s{0}.unpack(bytes(buf[offset:]).ljust(s{0}.size, b"\\0"))',
+             'else:',
+             '  {1}= s{0}.unpack_from(buf, offset)',
+             'offset += s{0}.size']
+    lines = [line.format(idx, names) for line in lines]
+  else:
+    env['r{}'.format(idx)] = READERS[ftype]
+    lines = ['v_{}, offset = r{}(buf, offset)'.format(fields[0].name, idx)]
+  for field in fields:
+    value = 'v_{}'.format(field.name)
+    if field.decode:
+      env['c_' + field.name] = field.decode
+      value = 'c_{0}(v_{0})'.format(field.name)
+    lines.append('self._{} = {}'.format(field.name, value))
+  return ['  ' + line for line in lines]
+
+
+def compile_decoder(layout):
+  """Generate a function decoding all the fields straight into the slots"""
+  env = {}
+  lines = ['def decode(self, buf, offset):', '  size = len(buf)']
+  for idx, segment in enumerate(layout):
+    # Older versions of WSJT-X don't send the last fields
+    lines.extend(['  if offset >= size:', '    return offset'])
+    lines.extend(_segment_lines(idx, segment, env))
+  lines.append('  return offset')
+  return _compile('\n'.join(lines), 'decode', env)
+
+
+def compile_encoder(layout):
+  """Generate a function returning the encoded packet"""
+  env = {'encode_header': encode_header}
+  lines = ['def encode(self):']
+  parts = ['encode_header(self._packet_type, self._client_id, self._schema_version)']
+  for idx, (ftype, fields, fmt) in enumerate(layout):
+    values = []
+    for field in fields:
+      env['d_' + field.name] = field.default
+      lines.append("  v_{0} = getattr(self, '_{0}', d_{0})".format(field.name))
+      if field.encode:
+        env['e_' + field.name] = field.encode
+        values.append('e_{0}(v_{0})'.format(field.name))
+      else:
+        values.append('v_{}'.format(field.name))
+    if fmt:
+      env['s{}'.format(idx)] = fmt
+      parts.append('s{}.pack({})'.format(idx, ', '.join(values)))
+    else:
+      env['w{}'.format(idx)] = WRITERS[ftype]
+      parts.append('w{}({})'.format(idx, values[0]))
+  lines.append('  return b"".join(({},))'.format(', '.join(parts)))
+  return _compile('\n'.join(lines), 'encode', env)
 
-  def _encode(self):
-    self._packet_type = PacketType.HEARTBEAT
-    super()._encode()
-    self._set_uint32(self.MaxSchema)
-    self._set_string(self.Version)
-    self._set_string(self.Revision)
 
-  @property
-  def MaxSchema(self):
-    return self._data.get('MaxSchema', WS_SCHEMA)
+def field_property(field):
+  name = field.name
+  slot = '_' + name
+  default = field.default
 
-  @property
-  def Version(self):
-    return self._data.get('Version', WS_VERSION)
+  def getter(self):
+    return getattr(self, slot, default)
 
-  @property
-  def Revision(self):
-    return self._data.get('Revision', WS_REVISION)
-
-
-class WSStatus(_WSPacket):
-  """Packet Type 1 Status  (Out)"""
-  def __init__(self, pkt=None):
-    super().__init__(pkt)
-    self._packet_type = PacketType.STATUS
-
-  def _decode(self):
-    super()._decode()
-    self._data['Frequency'] = self._get_longlong()
-    self._data['Mode'] = self._get_string()
-    self._data['DXCall'] = self._get_string()
-    self._data['Report'] = self._get_string()
-    self._data['TXMode'] = self._get_string()
-    self._data['TXEnabled'] = self._get_bool()
-    self._data['Transmitting'] = self._get_bool()
-    self._data['Decoding'] = self._get_bool()
-    self._data['RXdf'] = self._get_uint32()
-    self._data['TXdf'] = self._get_uint32()
-    self._data['DeCall'] = self._get_string()
-    self._data['DeGrid'] = self._get_string()
-    self._data['DEGrid'] = self._get_string()
-    self._data['TXWatchdog'] = self._get_bool()
-    self._data['SubMode'] = self._get_string()
-    self._data['Fastmode'] = self._get_bool()
-    self._data['SOMode'] = SOMode(self._get_byte())
-    self._data['FreqTolerance'] = self._get_uint32()
-    self._data['TRPeriod'] = self._get_uint32()
-    self._data['ConfigName'] = self._get_string()
-    self._data['TxMessage'] = self._get_string()
+  def setter(self, value):
+    setattr(self, slot, value)
 
-  @property
-  def Frequency(self):
-    return self._data['Frequency']
+  return property(getter, setter, doc='{} ({})'.format(name, field.ftype))
 
-  @property
-  def Mode(self):
-    return Mode(self._data['Mode']).name
 
-  @property
-  def DXCall(self):
-    return self._data['DXCall']
+class _WSPacket:
+  """The schema of each packet class is compiled into `_decode_fields`
+  and `_encode_fields`. Properties are created for the fields that don't
+  have one in the class."""
 
-  @property
-  def Report(self):
-    return self._data['Report']
+  __slots__ = ('_magic_number', '_schema_version', '_packet_type', '_client_id', '_packet')
 
-  @property
-  def TXMode(self):
-    return self._data['TXMode']
+  TYPE = None
+  CLIENT_ID = WS_CLIENTID
+  SCHEMA = ()
 
-  @property
-  def TXEnabled(self):
-    return self._data['TXEnabled']
+  _layout = ()
+  _defaults = {}
 
-  @property
-  def Transmitting(self):
-    return self._data['Transmitting']
+  def __init_subclass__(cls, **kwargs):
+    super().__init_subclass__(**kwargs)
+    cls._layout = compile_layout(cls.SCHEMA)
+    cls._defaults = {field.name: field.default for field in cls.SCHEMA}
+    cls._decode_fields = compile_decoder(cls._layout)
+    cls._encode_fields = compile_encoder(cls._layout)
+    for field in cls.SCHEMA:
+      if field.name not in cls.__dict__:
+        setattr(cls, field.name, field_property(field))
 
-  @property
-  def Decoding(self):
-    return self._data['Decoding']
+  def __init__(self, pkt=None):
+    self._packet_type = self.TYPE
+    if pkt is None:
+      self._packet = None
+      self._magic_number = WS_MAGIC
+      self._schema_version = WS_SCHEMA
+      self._client_id = self.CLIENT_ID
+      return
 
-  @property
-  def RXdf(self):
-    return self._data['RXdf']
+    # Decode straight from the received datagram, no copy.
+    buf = self._packet = memoryview(pkt)
+    self._magic_number, self._schema_version, _ = SHEAD.unpack_from(buf)
+    self._client_id, offset = read_string(buf, SHEAD.size)
+    self._decode_fields(buf, offset)
 
-  @property
-  def TXdf(self):
-    return self._data['TXdf']
+  def _decode_fields(self, buf, offset):
+    """Replaced by the function compiled from the schema"""
 
-  @property
-  def DeCall(self):
-    return self._data['DeCall']
+  def _encode_fields(self):
+    """Replaced by the function compiled from the schema"""
 
-  @property
-  def DeGrid(self):
-    return self._data['DeGrid']
+  def raw(self):
+    try:
+      return self._encode_fields()
+    except (struct.error, TypeError) as err:
+      raise IOError(err) from None
 
-  @property
-  def DEGrid(self):
-    return self._data['DEGrid']
+  def _field(self, name):
+    """Value of a field, its default when the packet doesn't have it"""
+    return getattr(self, '_' + name, self._defaults[name])
 
-  @property
-  def TXWatchdog(self):
-    return self._data['TXWatchdog']
+  def as_dict(self):
+    return {field.name: getattr(self, '_' + field.name) for field in self.SCHEMA
+            if hasattr(self, '_' + field.name)}
 
-  @property
-  def SubMode(self):
-    return self._data['SubMode']
+  def __repr__(self):
+    sbuf = [str(self.__class__)]
+    for key, val in sorted(self.as_dict().items()):
+      sbuf.append("{}:{}".format(key, val))
+    return ', '.join(sbuf)
 
-  @property
-  def Fastmode(self):
-    return self._data['Fastmode']
 
-  @property
-  def SOMode(self):
-    return self._data['SOMode']
+class WSHeartbeat(_WSPacket):
+  """Packet Type 0 Heartbeat (In/Out)"""
+  TYPE = PacketType.HEARTBEAT
+  SCHEMA = (
+    Field('MaxSchema', 'uint32', WS_SCHEMA),
+    Field('Version', 'string', WS_VERSION),
+    Field('Revision', 'string', WS_REVISION),
+  )
+  __slots__ = slots(SCHEMA)
 
-  @property
-  def FreqTolerance(self):
-    return self._data['FreqTolerance']
+  def __repr__(self):
+    return "{} - Schema: {} Version: {} Revision: {}".format(
+      self.__class__, self._field('MaxSchema'), self._field('Version'), self._field('Revision'))
 
-  @property
-  def TRPeriod(self):
-    return self._data['TRPeriod']
 
-  @property
-  def ConfigName(self):
-    return self._data['ConfigName']
+class WSStatus(_WSPacket):
+  """Packet Type 1 Status  (Out)"""
+  TYPE = PacketType.STATUS
+  SCHEMA = (
+    Field('Frequency', 'longlong'),
+    Field('Mode', 'string'),
+    Field('DXCall', 'string'),
+    Field('Report', 'string'),
+    Field('TXMode', 'string'),
+    Field('TXEnabled', 'bool'),
+    Field('Transmitting', 'bool'),
+    Field('Decoding', 'bool'),
+    Field('RXdf', 'uint32'),
+    Field('TXdf', 'uint32'),
+    Field('DeCall', 'string'),
+    Field('DeGrid', 'string'),
+    Field('DEGrid', 'string'),
+    Field('TXWatchdog', 'bool'),
+    Field('SubMode', 'string'),
+    Field('Fastmode', 'bool'),
+    Field('SOMode', 'byte', SOMode.NONE, decode=SOMode, encode=lambda val: val.value),
+    Field('FreqTolerance', 'uint32'),
+    Field('TRPeriod', 'uint32'),
+    Field('ConfigName', 'string'),
+    Field('TxMessage', 'string'),
+  )
+  __slots__ = slots(SCHEMA)
 
   @property
-  def TxMessage(self):
-    return self._data['TxMessage']
+  def Mode(self):
+    return Mode(self._field('Mode')).name
 
 
 class WSDecode(_WSPacket):
   """Packet Type 2  Decode  (Out)"""
-  def __init__(self, pkt=None):
-    super().__init__(pkt)
-    self._packet_type = PacketType.DECODE
-
-  def _decode(self):
-    super()._decode()
-    self._data['New'] = self._get_bool()
-    self._data['Time'] = wstime2datetime(self._get_uint32())
-    self._data['SNR'] = self._get_int32()
-    self._data['DeltaTime'] = round(self._get_double(), 3)
-    self._data['DeltaFrequency'] = self._get_uint32()
-    self._data['Mode'] = self._get_string()
-    self._data['Message'] = self._get_string()
-    self._data['LowConfidence'] = self._get_bool()
-    self._data['OffAir'] = self._get_bool()
-
-  def as_dict(self):
-    return self._data
-
-  @property
-  def New(self):
-    return self._data['New']
-
-  @property
-  def Time(self):
-    return self._data['Time']
-
-  @property
-  def SNR(self):
-    return self._data['SNR']
-
-  @property
-  def DeltaTime(self):
-    return self._data['DeltaTime']
-
-  @property
-  def DeltaFrequency(self):
-    return self._data['DeltaFrequency']
+  TYPE = PacketType.DECODE
+  SCHEMA = (
+    Field('New', 'bool'),
+    Field('Time', 'uint32', None, decode=wstime2datetime, encode=datetime2wstime),
+    Field('SNR', 'int32'),
+    Field('DeltaTime', 'double', decode=lambda val: round(val, 3)),
+    Field('DeltaFrequency', 'uint32'),
+    Field('Mode', 'string'),
+    Field('Message', 'string'),
+    Field('LowConfidence', 'bool'),
+    Field('OffAir', 'bool'),
+  )
+  __slots__ = slots(SCHEMA)
 
   @property
   def Mode(self):
-    return Mode(self._data['Mode']).name
-
-  @property
-  def Message(self):
-    return self._data['Message']
-
-  @property
-  def LowConfidence(self):
-    return self._data['LowConfidence']
-
-  @property
-  def OffAir(self):
-    return self._data['OffAir']
+    return Mode(self._field('Mode')).name
 
 
 class WSClear(_WSPacket):
   """Packet Type 3  Clear (Out/In)"""
-  def __init__(self, pkt=None):
-    super().__init__(pkt)
-    self._packet_type = PacketType.CLEAR
-
-  def _decode(self):
-    super()._decode()
-    self._data['Window'] = None
-    if self._index < len(self._packet):
-      self._data['Window'] = self._get_byte()
-
-  @property
-  def Window(self):
-    return self._data['Window']
+  TYPE = PacketType.CLEAR
+  SCHEMA = (
+    Field('Window', 'byte', None, encode=lambda val: val or 0),
+  )
+  __slots__ = slots(SCHEMA)
 
 
 class WSReply(_WSPacket):
@@ -467,294 +499,156 @@ class WSReply(_WSPacket):
   * Low confidence         bool
   * Modifiers              quint8
   """
-  def __init__(self, pkt=None):
-    super().__init__(pkt)
-    self._packet_type = PacketType.REPLY
-    self._client_id = "AUTOFT"
-
-  def _encode(self):
-    super()._encode()
-    self._set_uint32(datetime2wstime(self._data['Time']))
-    self._set_int32(self._data['SNR'])
-    self._set_double(self._data['DeltaTime'])
-    self._set_uint32(self._data['DeltaFrequency'])
-    self._set_string(self._data['Mode'])
-    self._set_string(self._data['Message'])
-    self._set_bool(self._data.get('LowConfidence', False))
-    self._set_byte(self._data.get('Modifiers', Modifiers.NoModifier.value))
+  TYPE = PacketType.REPLY
+  CLIENT_ID = "AUTOFT"
+  SCHEMA = (
+    Field('Time', 'uint32', None, decode=wstime2datetime, encode=datetime2wstime),
+    Field('SNR', 'int32', None),
+    Field('DeltaTime', 'double', None),
+    Field('DeltaFrequency', 'uint32', None),
+    Field('Mode', 'string', None),
+    Field('Message', 'string', None),
+    Field('LowConfidence', 'bool'),
+    Field('Modifiers', 'byte'),             # Modifiers.NoModifier
+  )
+  __slots__ = slots(SCHEMA)
 
   @property
   def Time(self):
-    return self._data.get('Time')
+    return self._field('Time')
 
   @Time.setter
   def Time(self, val):
     assert isinstance(val, datetime), 'Object datetime expected'
-    self._data['Time'] = val
+    self._Time = val
 
   @property
   def SNR(self):
-    return self._data.get('SNR')
+    return self._field('SNR')
 
   @SNR.setter
   def SNR(self, val):
-    self._data['SNR'] = int(val)
+    self._SNR = int(val)
 
   @property
   def DeltaTime(self):
-    return self._data.get('DeltaTime')
+    return self._field('DeltaTime')
 
   @DeltaTime.setter
   def DeltaTime(self, val):
-    self._data['DeltaTime'] = float(val)
+    self._DeltaTime = float(val)
 
   @property
   def DeltaFrequency(self):
-    return self._data.get('DeltaFrequency')
+    return self._field('DeltaFrequency')
 
   @DeltaFrequency.setter
   def DeltaFrequency(self, val):
-    self._data['DeltaFrequency'] = int(val)
+    self._DeltaFrequency = int(val)
 
   @property
   def Mode(self):
-    return Mode(self._data.get('Mode')).name
+    return Mode(self._field('Mode')).name
 
   @Mode.setter
   def Mode(self, val):
     if len(val) == 1:
-      self._data['Mode'] = val
+      self._Mode = val
     else:
-      self._data['Mode'] = getattr(Mode, val).value
-
-  @property
-  def Message(self):
-    return self._data.get('Message')
-
-  @Message.setter
-  def Message(self, val):
-    self._data['Message'] = val
+      self._Mode = getattr(Mode, val).value
 
   @property
   def LowConfidence(self):
-    return self._data.get('LowConfidence')
+    return self._field('LowConfidence')
 
   @LowConfidence.setter
   def LowConfidence(self, val):
-    self._data['LowConfidence'] = bool(val)
+    self._LowConfidence = bool(val)
 
   @property
   def Modifiers(self):
-    return self._data.get('Modifiers', Modifiers.NoModifier)
+    return Modifiers(self._field('Modifiers'))
 
   @Modifiers.setter
   def Modifiers(self, modifier):
     assert isinstance(modifier, Modifiers)
-    self._data['Modifiers'] = modifier.value
+    self._Modifiers = modifier.value
 
 
 class WSLogged(_WSPacket):
   """Packet Type 5 QSO Logged (Out)"""
-  def __init__(self, pkt=None):
-    super().__init__(pkt)
-    self._packet_type = PacketType.QSOLOGGED
-
-  def _decode(self):
-    super()._decode()
-    self._data['DateTimeOff'] = self._get_datetime()
-    self._data['DXCall'] = self._get_string()
-    self._data['DXGrid'] = self._get_string()
-    self._data['DialFrequency'] = self._get_longlong()
-    self._data['Mode'] = self._get_string()
-    self._data['ReportSent'] = self._get_string()
-    self._data['ReportReceived'] = self._get_string()
-    self._data['TXPower'] = self._get_string()
-    self._data['Comments'] = self._get_string()
-    self._data['Name'] = self._get_string()
-    self._data['DateTimeOn'] = self._get_datetime()
-    self._data['OpCall'] = self._get_string()
-    self._data['MyCall'] = self._get_string()
-    self._data['MyGrid'] = self._get_string()
-    self._data['ExSent'] = self._get_string()
-    self._data['ExReceived'] = self._get_string()
-    self._data['PropMode'] = self._get_string()
-
-  def _encode(self):
-    super()._encode()
-    self._set_datetime(self._data['DateTimeOff'])
-    self._set_string(self._data['DXCall'])
-    self._set_string(self._data['DXGrid'])
-    self._set_longlong(self._data['DialFrequency'])
-    self._set_string(self._data['Mode'])
-    self._set_string(self._data['ReportSent'])
-    self._set_string(self._data['ReportReceived'])
-    self._set_string(self._data.get('TXPower'))
-    self._set_string(self._data.get('Comments'))
-    self._set_string(self._data.get('Name', ''))
-    self._set_datetime(self._data['DateTimeOn'])
-    self._set_string(self._data.get('OpCall', ''))
-    self._set_string(self._data.get('MyCall', ''))
-    self._set_string(self._data.get('MyGrid', ''))
-    self._set_string(self._data.get('ExSent', ''))
-    self._set_string(self._data.get('ExReceived', ''))
-    self._set_string(self._data.get('PropMode', ''))
+  TYPE = PacketType.QSOLOGGED
+  SCHEMA = (
+    Field('DateTimeOff', 'datetime'),
+    Field('DXCall', 'string'),
+    Field('DXGrid', 'string'),
+    Field('DialFrequency', 'longlong'),
+    Field('Mode', 'string'),
+    Field('ReportSent', 'string'),
+    Field('ReportReceived', 'string'),
+    Field('TXPower', 'string', None),
+    Field('Comments', 'string', None),
+    Field('Name', 'string'),
+    Field('DateTimeOn', 'datetime'),
+    Field('OpCall', 'string'),
+    Field('MyCall', 'string'),
+    Field('MyGrid', 'string'),
+    Field('ExSent', 'string'),
+    Field('ExReceived', 'string'),
+    Field('PropMode', 'string'),
+  )
+  __slots__ = slots(SCHEMA)
 
   @property
   def DateTimeOff(self):
-    return from_julian(*self._data['DateTimeOff'])
+    return from_julian(*self._field('DateTimeOff'))
 
   @DateTimeOff.setter
   def DateTimeOff(self, val):
     assert isinstance(val, datetime)
-    self._data['DateTimeOff'] = to_julian(val)
+    self._DateTimeOff = to_julian(val)
 
   @property
-  def DXCall(self):
-    return self._data['DXCall']
-
-  @DXCall.setter
-  def DXCall(self, val):
-    self._data['DXCall'] = val
-
-  @property
-  def DXGrid(self):
-    return self._data['DXGrid']
-
-  @DXGrid.setter
-  def DXGrid(self, val):
-    self._data['DXGrid'] = val
-
-  @property
-  def DialFrequency(self):
-    return self._data['DialFrequency']
+  def DateTimeOn(self):
+    return from_julian(*self._field('DateTimeOn'))
 
-  @DialFrequency.setter
-  def DialFrequency(self, val):
-    self._data['DialFrequency'] = val
+  @DateTimeOn.setter
+  def DateTimeOn(self, val):
+    self._DateTimeOn = to_julian(val)
 
   @property
   def Mode(self):
-    return Mode[self._data['Mode']].value
+    return Mode[self._field('Mode')].value
 
   @Mode.setter
   def Mode(self, val):
     assert isinstance(val, str)
     try:
-      self._data['Mode'] = getattr(Mode, val).value
+      self._Mode = getattr(Mode, val).value
     except AttributeError:
-      self._data['Mode'] = val
-
-  @property
-  def ReportSent(self):
-    return self._data['ReportSent']
-
-  @ReportSent.setter
-  def ReportSent(self, val):
-    self._data['ReportSent'] = val
-
-  @property
-  def ReportReceived(self):
-    return self._data['ReportReceived']
-
-  @ReportReceived.setter
-  def ReportReceived(self, val):
-    self._data['ReportReceived'] = val
+      self._Mode = val
 
   @property
   def TXPower(self):
-    return self._data['TXPower']
+    return self._field('TXPower')
 
   @TXPower.setter
   def TXPower(self, val):
     if isinstance(val, (int, float)):
       val = str(val)
-    self._data['TXPower'] = val
-
-  @property
-  def Comments(self):
-    return self._data['Comments']
-
-  @Comments.setter
-  def Comments(self, val):
-    self._data['Comments'] = val
-
-  @property
-  def Name(self):
-    return self._data['Name']
-
-  @Name.setter
-  def Name(self, val):
-    self._data['Name'] = val
-
-  @property
-  def DateTimeOn(self):
-    return from_julian(*self._data['DateTimeOn'])
-
-  @DateTimeOn.setter
-  def DateTimeOn(self, val):
-    self._data['DateTimeOn'] = to_julian(val)
-
-  @property
-  def OpCall(self):
-    return self._data['OpCall']
-
-  @OpCall.setter
-  def OpCall(self, val):
-    self._data['OpCall'] = val
-
-  @property
-  def MyCall(self):
-    return self._data['MyCall']
-
-  @MyCall.setter
-  def MyCall(self, val):
-    self._data['MyCall'] = val
-
-  @property
-  def MyGrid(self):
-    return self._data['MyGrid']
-
-  @MyGrid.setter
-  def MyGrid(self, val):
-    self._data['MyGrid'] = val
-
-  @property
-  def ExSent(self):
-    return self._data['ExSent']
-
-  @ExSent.setter
-  def ExSent(self, val):
-    self._data['ExSent'] = val
-
-  @property
-  def ExReceived(self):
-    return self._data['ExReceived']
-
-  @ExReceived.setter
-  def ExReceived(self, val):
-    self._data['ExReceived'] = val
-
-  @property
-  def PropMode(self):
-    return self._data['PropMode']
-
-  @PropMode.setter
-  def PropMode(self, val):
-    self._data['PropMode'] = val
+    self._TXPower = val
 
 
 class WSClose(_WSPacket):
   """Packet Type 6 Close (Out/In)"""
-  def __init__(self, pkt=None):
-    super().__init__(pkt)
-    self._packet_type = PacketType.CLOSE
+  TYPE = PacketType.CLOSE
+  __slots__ = ()
 
 
 class WSReplay(_WSPacket):
   """Packet Type 7 Replay (In)"""
-  def __init__(self, pkt=None):
-    super().__init__(pkt)
-    self._packet_type = PacketType.REPLAY
+  TYPE = PacketType.REPLAY
+  __slots__ = ()
 
 
 class WSHaltTx(_WSPacket):
@@ -764,94 +658,96 @@ class WSHaltTx(_WSPacket):
   self.mode = False
       Will stop the transmission immediately
   """
-  def __init__(self, pkt=None):
-    super().__init__(pkt)
-    self._packet_type = PacketType.HALTTX
-    self._data['mode'] = False
-
-  def _encode(self):
-    super()._encode()
-    self._set_bool(self._data['mode'])
+  TYPE = PacketType.HALTTX
+  SCHEMA = (
+    Field('mode', 'bool'),
+  )
+  __slots__ = slots(SCHEMA)
 
   @property
   def mode(self):
-    return self._data['mode']
+    return self._field('mode')
 
   @mode.setter
   def mode(self, val):
     assert isinstance(val, bool)
-    self._data['mode'] = val
+    self._mode = val
 
 
 class WSFreeText(_WSPacket):
   """Packet Type 9 Free Text (In)"""
-  def __init__(self, pkt=None):
-    super().__init__(pkt)
-    self._packet_type = PacketType.FREETEXT
-
-  def _encode(self):
-    super()._encode()
-    self._set_string(self._data.get('text', ''))
-    self._set_bool(self._data.get('send', True))
+  TYPE = PacketType.FREETEXT
+  SCHEMA = (
+    Field('text', 'string'),
+    Field('send', 'bool', True),
+  )
+  __slots__ = slots(SCHEMA)
 
   @property
   def text(self):
-    return self._data.get('text', '')
+    return self._field('text')
 
   @text.setter
   def text(self, val):
     assert isinstance(val, str), 'Expecting a string'
-    self._data['text'] = val
+    self._text = val
 
   @property
   def send(self):
-    return self._data.get('send', True)
+    return self._field('send')
 
   @send.setter
   def send(self, val):
     assert isinstance(val, bool), 'Expecting a boolean'
-    self._data['send'] = val
+    self._send = val
 
 
 class WSWSPRDecode(_WSPacket):
   """Packet Type 10 WSPR Decode (Out)"""
-  def __init__(self, pkt=None):
-    super().__init__(pkt)
-    self._packet_type = PacketType.WSPRDECODE
+  TYPE = PacketType.WSPRDECODE
+  SCHEMA = (
+    Field('New', 'bool'),
+    Field('Time', 'uint32', None, decode=wstime2datetime, encode=datetime2wstime),
+    Field('SNR', 'int32'),
+    Field('DeltaTime', 'double'),
+    Field('Frequency', 'longlong'),
+    Field('Drift', 'int32'),
+    Field('Callsign', 'string'),
+    Field('Grid', 'string'),
+    Field('Power', 'int32'),
+    Field('OffAir', 'bool'),
+  )
+  __slots__ = slots(SCHEMA)
 
 
 class WSLocation(_WSPacket):
   """Packet Type 11 Location (In)"""
-  def __init__(self, pkt=None):
-    super().__init__(pkt)
-    self._packet_type = PacketType.LOCATION
+  TYPE = PacketType.LOCATION
+  SCHEMA = (
+    Field('Location', 'string'),
+  )
+  __slots__ = slots(SCHEMA)
 
 
 class WSADIF(_WSPacket):
   """Packet Type 12 Logged ADIF (Out)"""
-  def __init__(self, pkt=None):
-    super().__init__(pkt)
-    self._packet_type = PacketType.LOGGEDADIF
-
-  def _decode(self):
-    super()._decode()
-    self._data['ADIF'] = self._get_string()
+  TYPE = PacketType.LOGGEDADIF
+  SCHEMA = (
+    Field('ADIF', 'string'),
+  )
+  __slots__ = slots(SCHEMA)
 
   def __str__(self):
-    return ''.join(self._data['ADIF'].split('\n'))
+    return ''.join(self._field('ADIF').split('\n'))
 
   def __repr__(self):
-    if 'ADIF' in self._data:
-      return "{} {}".format(self.__class__, self._data['ADIF'])
-    return "{} {}".format(self.__class__, self._packet.raw)
+    if hasattr(self, '_ADIF'):
+      return "{} {}".format(self.__class__, self._ADIF)
+    return "{} {}".format(self.__class__, bytes(self._packet or b''))
 
   @property
   def Id(self):
-    return self._data['Id']
-
-  @property
-  def ADIF(self):
-    return self._data['ADIF']
+    return self._client_id
 
 
 class WSHighlightCallsign(_WSPacket):
@@ -862,105 +758,116 @@ class WSHighlightCallsign(_WSPacket):
   Foreground Color       QColor
   Highlight last         bool
   """
-  def __init__(self, pkt=None):
-    super().__init__(pkt)
-    self._packet_type = PacketType.HIGHLIGHTCALLSIGN
-
-  def _encode(self):
-    super()._encode()
-    self._set_string(self._data['call'])
-
-    self._set_uint16(0xffff)
-    for val in self._data.get('Foreground', (0xffff, 0xff, 0xff)):
-      self._set_uint16(val)
-
-    self._set_uint16(0xffff)
-    for val in self._data.get('Background', (0, 0, 0)):
-      self._set_uint16(val)
-
-    self._set_bool(self._data.get('HighlightLast', True))
+  TYPE = PacketType.HIGHLIGHTCALLSIGN
+  SCHEMA = (
+    Field('call', 'string', None),
+    Field('Foreground', 'color', (0xffff, 0xff, 0xff)),
+    Field('Background', 'color', (0, 0, 0)),
+    Field('HighlightLast', 'bool', True, encode=bool),
+  )
+  __slots__ = slots(SCHEMA)
 
   def __repr__(self):
-    return "{} call: {}".format(self.__class__, self._data.get('call', 'NoCall'))
+    return "{} call: {}".format(self.__class__, self._field('call') or 'NoCall')
 
   @property
   def call(self):
-    return self._data['call']
+    return self._field('call')
 
   @call.setter
   def call(self, call):
     assert isinstance(call, str), 'The callsign must be a string'
-    self._data['call'] = call
+    self._call = call
 
   @property
   def Background(self):
-    return self._data['Background']
+    return self._field('Background')
 
   @Background.setter
   def Background(self, rgb):
     assert isinstance(rgb, (list, tuple)), "Tuple object expected"
-    self._data['Background'] = rgb
+    self._Background = rgb
 
   @property
   def Foreground(self):
-    return self._data['Foreground']
+    return self._field('Foreground')
 
   @Foreground.setter
   def Foreground(self, rgb):
     assert isinstance(rgb, (list, tuple)), "Tuple object expected"
-    self._data['Foreground'] = rgb
-
-  @property
-  def HighlightLast(self):
-    return self._data['HighlightLast']
-
-  @HighlightLast.setter
-  def HighlightLast(self, val):
-    self._data['HighlightLast'] = bool(val)
+    self._Foreground = rgb
 
 
 class WSSwitchConfiguration(_WSPacket):
   """Packet Type 14 Switch Configuration (In)"""
-  def __init__(self, pkt=None):
-    super().__init__(pkt)
-    self._packet_type = PacketType.SWITCHCONFIGURATION
+  TYPE = PacketType.SWITCHCONFIGURATION
+  SCHEMA = (
+    Field('ConfigurationName', 'string'),
+  )
+  __slots__ = slots(SCHEMA)
 
 
 class WSConfigure(_WSPacket):
-  """Packet Type 15 Configure (In)"""
-  def __init__(self, pkt=None):
-    super().__init__(pkt)
-    self._packet_type = PacketType.CONFIGURE
-
-
-def from_julian(jday, msec, *_):
-  # this function doesn't work with dates prior to 2000
-  epoch = datetime(2000, 1, 1)
-  tdelta = timedelta(days=jday - JULIAN_ORIGIN)
-  day = epoch + tdelta
-  dtime = day + timedelta(microseconds=msec * 1000)
-  return dtime
-
-
-def to_julian(dtime):
-  # this function doesn't work with dates prior to 2000
-  epoch = datetime(2000, 1, 1)
-  delta = dtime - epoch
-  jday = delta.days + JULIAN_ORIGIN
-  milliseconds = int(delta.seconds * 1000)
-  return (jday, milliseconds, 1, 0)
-
+  """Packet Type 15 Configure (In)
+  Empty strings and 0xffffffff leave the WSJT-X setting unchanged.
+  """
+  TYPE = PacketType.CONFIGURE
+  SCHEMA = (
+    Field('Mode', 'string'),
+    Field('FrequencyTolerance', 'uint32', 0xffffffff),
+    Field('SubMode', 'string'),
+    Field('FastMode', 'bool'),
+    Field('TRPeriod', 'uint32', 0xffffffff),
+    Field('RXdf', 'uint32', 0xffffffff),
+    Field('DXCall', 'string'),
+    Field('DXGrid', 'string'),
+    Field('GenerateMessages', 'bool'),
+  )
+  __slots__ = slots(SCHEMA)
+
+
+class ReplyEncoder:
+  """Build the Reply and HaltTx packets from pre-encoded templates.
+  Only the fields specific to the station being called are packed at
+  send time, the result is the same as WSReply().raw().
+  """
+  REPLY_FIELDS = struct.Struct('!IidI')       # Time, SNR, DeltaTime, DeltaFrequency
+  REPLY_TAIL = struct.Struct('!?B')           # LowConfidence, Modifiers
+
+  def __init__(self, client_id='AUTOFT'):
+    self.client_id = client_id
+    self._reply_head = encode_header(PacketType.REPLY, client_id)
+    self._modes = {m.value: encode_string(m.value) for m in Mode}
+    self._halt_tx = {
+      mode: encode_header(PacketType.HALTTX) + SBOOL.pack(mode) for mode in (True, False)
+    }
+
+  def reply(self, dtime, snr, delta_time, delta_frequency, mode, message,
+            low_confidence=False, modifiers=Modifiers.NoModifier):
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    if len(mode) > 1:
+      mode = getattr(Mode, mode).value
+    try:
+      return b''.join((
+        self._reply_head,
+        self.REPLY_FIELDS.pack(datetime2wstime(dtime), int(snr), float(delta_time),
+                               int(delta_frequency)),
+        self._modes.get(mode) or encode_string(mode),
+        encode_string(message),
+        self.REPLY_TAIL.pack(bool(low_confidence), modifiers.value),
+      ))
+    except struct.error as err:
+      raise IOError(err) from None
 
-def wstime2datetime(qtm):
-  """wsjtx time containd the number of milliseconds since midnight"""
-  tday_midnight = datetime.combine(datetime.utcnow(), datetime.min.time())
-  return tday_midnight + timedelta(milliseconds=qtm)
+  def halt_tx(self, mode=False):
+    """mode True stops at the end of the sequence, False stops immediately"""
+    return self._halt_tx[bool(mode)]
 
 
-def datetime2wstime(dtime):
-  """wsjtx time containd the number of milliseconds since midnight"""
-  tday_midnight = datetime.combine(datetime.utcnow(), datetime.min.time())
-  return int((dtime - tday_midnight).total_seconds() * 1000)
+PACKET_CLASSES = {cls.TYPE.value: cls for cls in (
+  WSHeartbeat, WSStatus, WSDecode, WSClear, WSReply, WSLogged, WSClose, WSWSPRDecode,
+  WSADIF, WSHighlightCallsign,
+)}
 
 
 def ft8_decode(pkt):
@@ -969,19 +876,7 @@ def ft8_decode(pkt):
   if magic != WS_MAGIC:
     raise IOError('Not a WSJT-X packet')
 
-  switch_map = {
-    PacketType.HEARTBEAT.value: WSHeartbeat,
-    PacketType.STATUS.value: WSStatus,
-    PacketType.DECODE.value: WSDecode,
-    PacketType.CLEAR.value: WSClear,
-    PacketType.REPLY.value: WSReply,
-    PacketType.QSOLOGGED.value: WSLogged,
-    PacketType.CLOSE.value: WSClose,
-    PacketType.LOGGEDADIF.value: WSADIF,
-    PacketType.HIGHLIGHTCALLSIGN.value: WSHighlightCallsign,
-  }
-
   try:
-    return switch_map[pkt_type](pkt)
+    return PACKET_CLASSES[pkt_type](pkt)
   except KeyError:
     raise NotImplementedError("Packet type '{:d}' unknown".format(pkt_type)) from None